@@ -1,233 +1,67 @@
-from shiny import reactive, render
-from shiny.express import input, ui
+from shiny import reactive, render, req
+from shiny.express import input, session, ui
 import plotly.graph_objects as go
 from shinywidgets import render_plotly
-import math
-
-# Calculation helper functions
-def calculate_entropy(n1, n2, t):
-    p1 = n1/t
-    p2 = n2/t
-    log1 = 0 if p1 == 0 else math.log2(p1)
-    log2 = 0 if p2 == 0 else math.log2(p2)
-
-    return 0.0 if round(-p1 * log1 - p2 * log2, 2) == 0.0 else round(-p1 * log1 - p2 * log2, 2)
-
-def calculate_condent(n1, n2, t, e1, e2):
-    p1 = n1/t
-    p2 = n2/t
-    return round(p1 * e1 + p2 * e2, 2)
-
-def calculate_infogain(e1, e2):
-    return round(e1-e2, 2)
-
-# Create the information gain calculations in mathjax
-# Show equations corresponding to what step of the calculation the user is on
-def create_mathjax_content(info):
-    lines = {
-        1: f"""
-            <div style="text-align: center; font-size: 20px; font-weight: normal; color: #1F4A89; line-height: 1;">
-                <span>\\(H(\\)</span>
-                {tooltip_test("Y", f"(Oranges, Lemons)", f"Y")}
-                <span>\\()=-\\)</span>
-                {tooltip_test("Total lemons", "Total lemons / Total datapoints", f"\\frac{info['lemons']}{info['total']} \\log_{2} \\frac{info['lemons']}{info['total']}")}
-                <span>\\(-\\)</span>
-                {tooltip_test("Total oranges", "Total oranges / Total datapoints", f"\\frac{info['oranges']}{info['total']} \\log_{2} \\frac{info['oranges']}{info['total']}")}
-                <span>\\( \\approx{info['h_y']} \\)
-            </div>
-
-            <script>
-                document.getElementById("Total lemons").addEventListener("mouseenter", function() {{
-                    Shiny.setInputValue("btn_all_lemons", "Hovered", {{priority: "event"}});
-                }});
-                document.getElementById("Total lemons").addEventListener("mouseleave", function() {{
-                    Shiny.setInputValue("btn_all_lemons", "Not Hovered", {{priority: "event"}});
-                }});
-
-                document.getElementById("Total oranges").addEventListener("mouseenter", function() {{
-                    Shiny.setInputValue("btn_all_oranges", "Hovered", {{priority: "event"}});
-                }});
-                document.getElementById("Total oranges").addEventListener("mouseleave", function() {{
-                    Shiny.setInputValue("btn_all_oranges", "Not Hovered", {{priority: "event"}});
-                }});
-
-                updateMathJax();
-            </script>
-        """,
-        2: f"""
-            <div style="text-align: center; font-size: 20px; font-weight: normal; color: #1F4A89; line-height: 1;">
-                <span>\\(H(\\)</span>
-                {tooltip_test("Y", f"Oranges, Lemons", f"Y")}
-                <span>\\(|\\)</span>
-                {tooltip_test("X side 1", f"Only looking at the {info['side1']} side of the split", f"X = {info['side1']}")}
-                <span>\\()=-\\)</span>
-                {tooltip_test("Lemons side 1", f"Total lemons ({info['side1']}) / Total datapoints ({info['side1']})", f"\\frac{info['side1_lemon']}{info['side1s']} \\log_{2} \\frac{info['side1_lemon']}{info['side1s']}")}
-                <span>\\(-\\)</span>
-                {tooltip_test("Oranges side 1", f"Total oranges ({info['side1']}) / Total datapoints ({info['side1']})", f"\\frac{info['side1_orange']}{info['side1s']} \\log_{2} \\frac{info['side1_orange']}{info['side1s']}")}
-                <span>\\( \\approx{info['h_yside1']} \\)
-            </div>
-
-            <script>
-                document.getElementById("X side 1").addEventListener("mouseenter", function() {{
-                    Shiny.setInputValue("btn_X_side1", "Hovered", {{priority: "event"}});
-                }});
-                document.getElementById("X side 1").addEventListener("mouseleave", function() {{
-                    Shiny.setInputValue("btn_X_side1", "Not Hovered", {{priority: "event"}});
-                }});
-
-                document.getElementById("Lemons side 1").addEventListener("mouseenter", function() {{
-                    Shiny.setInputValue("btn_lemons_side1", "Hovered", {{priority: "event"}});
-                }});
-                document.getElementById("Lemons side 1").addEventListener("mouseleave", function() {{
-                    Shiny.setInputValue("btn_lemons_side1", "Not Hovered", {{priority: "event"}});
-                }});
-
-                document.getElementById("Oranges side 1").addEventListener("mouseenter", function() {{
-                    Shiny.setInputValue("btn_oranges_side1", "Hovered", {{priority: "event"}});
-                }});
-                document.getElementById("Oranges side 1").addEventListener("mouseleave", function() {{
-                    Shiny.setInputValue("btn_oranges_side1", "Not Hovered", {{priority: "event"}});
-                }});
-
-                updateMathJax();
-            </script>
-        """,
-        3: f"""
-            <div style="text-align: center; font-size: 20px; font-weight: normal; color: #1F4A89; line-height: 1;">
-                <span>\\(H(\\)</span>
-                {tooltip_test("Y", f"Oranges, Lemons", f"Y")}
-                <span>\\(|\\)</span>
-                {tooltip_test("X side 2", f"Only looking at the {info['side2']} side of the split", f"X = {info['side2']}")}
-                <span>\\()=-\\)</span>
-                {tooltip_test("Lemons side 2", f"Total lemons ({info['side2']}) / Total datapoints ({info['side2']})", f"\\frac{info['side2_lemon']}{info['side2s']} \\log_{2} \\frac{info['side2_lemon']}{info['side2s']}")}
-                <span>\\(-\\)</span>
-                {tooltip_test("Oranges side 2", f"Total oranges ({info['side2']}) / Total datapoints ({info['side2']})", f"\\frac{info['side2_orange']}{info['side2s']} \\log_{2} \\frac{info['side2_orange']}{info['side2s']}")}
-                <span>\\( \\approx{info['h_yside2']} \\)
-            </div>
-
-            <script>
-                document.getElementById("X side 2").addEventListener("mouseenter", function() {{
-                    Shiny.setInputValue("btn_X_side2", "Hovered", {{priority: "event"}});
-                }});
-                document.getElementById("X side 2").addEventListener("mouseleave", function() {{
-                    Shiny.setInputValue("btn_X_side2", "Not Hovered", {{priority: "event"}});
-                }});
-
-                document.getElementById("Lemons side 2").addEventListener("mouseenter", function() {{
-                    Shiny.setInputValue("btn_lemons_side2", "Hovered", {{priority: "event"}});
-                }});
-                document.getElementById("Lemons side 2").addEventListener("mouseleave", function() {{
-                    Shiny.setInputValue("btn_lemons_side2", "Not Hovered", {{priority: "event"}});
-                }});
-
-                document.getElementById("Oranges side 2").addEventListener("mouseenter", function() {{
-                    Shiny.setInputValue("btn_oranges_side2", "Hovered", {{priority: "event"}});
-                }});
-                document.getElementById("Oranges side 2").addEventListener("mouseleave", function() {{
-                    Shiny.setInputValue("btn_oranges_side2", "Not Hovered", {{priority: "event"}});
-                }});
-
-                updateMathJax();
-            </script>
-        """,
-        4: f"""
-            <div style="text-align: center; font-size: 20px; font-weight: normal; color: #1F4A89; line-height: 1;">
-                <span>\\(H(\\)</span>
-                {tooltip_test("Y", f"Oranges, Lemons", f"Y")}
-                <span>\\(|\\)</span>
-                {tooltip_test("X", f"{info['side1']}, {info['side2']}", f"X")}
-                <span>\\()=\\)</span>
-                {tooltip_test("Side 1", f"Total {info['side1']} datapoints / Total datapoints", f"\\frac{info['side1s']}{info['total']}")}
-                <span>\\(\\cdot\\)</span>
-                {tooltip_test("Hy Side 1", f"H(Y|X={info['side1']})", f"{info['h_yside1']}")}
-                <span>\\(+\\)</span>
-                {tooltip_test("Side 2", f"Total {info['side2']} datapoints / Total datapoints", f"\\frac{info['side2s']}{info['total']}")}
-                <span>\\(\\cdot\\)</span>
-                {tooltip_test("Hy Side 2", f"H(Y|X={info['side2']})", f"{info['h_yside2']}")}
-                <span>\\( \\approx{info['h_yx']} \\)
-            </div>
-
-            <script>
-                document.getElementById("Side 1").addEventListener("mouseenter", function() {{
-                    Shiny.setInputValue("btn_side1", "Hovered", {{priority: "event"}});
-                }});
-                document.getElementById("Side 1").addEventListener("mouseleave", function() {{
-                    Shiny.setInputValue("btn_side1", "Not Hovered", {{priority: "event"}});
-                }});
-
-                document.getElementById("Side 2").addEventListener("mouseenter", function() {{
-                    Shiny.setInputValue("btn_side2", "Hovered", {{priority: "event"}});
-                }});
-                document.getElementById("Side 2").addEventListener("mouseleave", function() {{
-                    Shiny.setInputValue("btn_side2", "Not Hovered", {{priority: "event"}});
-                }});
-
-                updateMathJax();
-            </script>
-        """,
-        5: f"""
-            <div style="text-align: center; font-size: 20px; font-weight: normal; color: #1F4A89; line-height: 1;">
-                {tooltip_test("infogain", f"Information gain from this split", f"IG(Y|X)")}
-                <span>\\(=\\)</span>
-                {tooltip_test("Hy", f"H(Y)", f"{info['h_y']}")}
-                <span>\\(-\\)</span>
-                {tooltip_test("Hyx", f"H(Y|X)", f"{info['h_yx']}")}
-                <span>\\(\\approx {info['infogain']}\\)</span>
-            </div>
-
-            <script>
-                document.getElementById("Hy").addEventListener("mouseenter", function() {{
-                    Shiny.setInputValue("btn_Hy", "Hovered", {{priority: "event"}});
-                }});
-                document.getElementById("Hy").addEventListener("mouseleave", function() {{
-                    Shiny.setInputValue("btn_Hy", "Not Hovered", {{priority: "event"}});
-                }});
-
-                document.getElementById("Hyx").addEventListener("mouseenter", function() {{
-                    Shiny.setInputValue("btn_Hyx", "Hovered", {{priority: "event"}});
-                }});
-                document.getElementById("Hyx").addEventListener("mouseleave", function() {{
-                    Shiny.setInputValue("btn_Hyx", "Not Hovered", {{priority: "event"}});
-                }});
-
-                updateMathJax();
-            </script>
-        """,
-        6: f"""
-            <div style="text-align: center; font-size: 20px; font-weight: normal; color: #fff; line-height: 1;">
-                <span>\\(IG(Y|X)\\)</span>
-            </div>
-        """
-    }
-    
-    # Start the HTML content
-    mathjax_html = """"""
-    
-    # Add the selected line based on the `step`
-    for i in range(1, 6):
-        if i <= step.get():
-            mathjax_html += lines[i]
-    # Add blank spacing to keep formatting the same
-    for i in range(5-step.get()):
-        mathjax_html += lines[6]
-    
-    return mathjax_html
-
-# Starter datapoints to plot and other reactive value setups
-o_points = reactive.value({'x': [1, 2, 4, 8, 7], 'y': [3, 7, 6, 5, 4]})
-l_points = reactive.value({'x': [5, 8], 'y': [4, 2]})
-x_coord = reactive.value(0)
-y_coord = reactive.value(0)
-vertical_split = reactive.value(True)
-split_loc = reactive.value(3)
-o_outline_width = reactive.value([0, 0, 0, 0, 0])
-l_outline_width = reactive.value([0, 0])
-step = reactive.value(5)
-show_rect = reactive.value(0)
-rect_coords = reactive.value([0, 0, 0, 0])
-notation = reactive.value(False)
-variables = reactive.value(False)
-definition = reactive.value(False)
+import numpy as np
+import hashlib
+import os
+from pathlib import Path
+
+from dataset import CLASSES, LABELS, N_CLASSES, random_points
+from dataio import AVAILABLE_FORMATS, file_format, read_points, write_points
+from entropy import split_info, table_infogain
+from figures import (
+    BEST_ANNOTATION, BEST_SHAPE, RECT_SHAPE, REGION_SHAPES, SPLIT_SHAPE, SVG,
+    class_markers, class_trace, draw_points, feature_figure, point_mode, region_shapes, split_label, split_line,
+)
+from highlight import RegionMasks, hover_targets
+from mathjax import class_key, create_mathjax_content
+from metrics import enable as enable_metrics, instrument, summary_html, track_session
+from ratelimit import debounce, throttle
+from splits import X_AXIS, Y_AXIS, best_splits
+from state import MAX_POINTS, SessionState
+from tree import fit_tree
+
+# Range of the split location slider
+SPLIT_MIN = 0
+SPLIT_MAX = 10
+SPLIT_STEP = 0.5  # (a multiple of the cell width of POINT_BINS in figures.py)
+
+# Seconds between updates while the split slider is dragged (or the direction switch is
+# flipped back and forth), and how long the coordinate boxes wait for typing to stop
+# (see ratelimit.py). Set either to 0 to follow every change
+SPLIT_THROTTLE = 0.15
+COORD_DEBOUNCE = 0.4
+
+# Highlight datapoints in the browser when the equations are hovered, instead of
+# sending every mouseenter/mouseleave to the server (see send_hover_regions)
+CLIENT_HOVER = True
+
+# Lay out the equations on the server as plain HTML (see texhtml.py), instead of
+# having MathJax typeset them in the browser after every update
+SERVER_MATH = False
+
+# Load the full MathJax from cdnjs to typeset the equations, instead of the app's own
+# small renderer in www/math/texmath.js (which works offline, but only knows the TeX
+# used in mathjax.py)
+MATHJAX_CDN = False
+# The renderer's address changes whenever the file does, so browsers can cache it for good
+TEXMATH_URL = "math/texmath.js?v=" + hashlib.md5((Path(__file__).parent / "www" / "math" / "texmath.js").read_bytes()).hexdigest()[:10]
+
+# Time every effect and output, track which inputs made them run and count what's
+# sent to the browser (see metrics.py). Shown in a debug panel at the bottom of the
+# app and served for Prometheus at http://127.0.0.1:METRICS_PORT/metrics
+# (METRICS_PORT = None for just the panel). When running several workers (workers.py),
+# each one gets the next port along: 9464, 9465, ...
+METRICS = False
+METRICS_PORT = 9464 + int(os.environ.get("WORKER_INDEX", 0))
+if METRICS:
+    enable_metrics(METRICS_PORT)
+
+# Every session gets its own state, freed again when the session closes
+state = SessionState()
+_ = session.on_ended(state.close)
+track_session(session)
 
 # Make main screen with title
 ui.page_opts(
@@ -235,12 +69,47 @@ ui.page_opts(
     fillable=True,
 )
 
+# A math renderer is only needed when the server isn't laying out the equations
+if not SERVER_MATH and MATHJAX_CDN:
+    ui.HTML("""
+        <script type="text/javascript" async 
+            src="https://cdnjs.cloudflare.com/ajax/libs/mathjax/2.7.7/MathJax.js?config=TeX-MML-AM_CHTML">
+        </script>
+
+        <script>
+            document.addEventListener("shiny:value", updateMathJax);
+        </script>
+    """)
+elif not SERVER_MATH:
+    ui.HTML(f"""
+        <script>
+            // The app's own math renderer (www/math/texmath.js), only loaded once the
+            // plot has shown up so it doesn't hold up the first paint
+            var mathLoading = false;
+            function loadMath() {{
+                if (mathLoading) {{
+                    return;
+                }}
+                mathLoading = true;
+                var script = document.createElement("script");
+                script.src = "{TEXMATH_URL}";
+                script.onload = updateMathJax;
+                document.head.appendChild(script);
+            }}
+            document.addEventListener("shiny:value", function(event) {{
+                if (event.name === "feature_plot") {{
+                    setTimeout(loadMath, 0);
+                }}
+            }});
+            // In case the plot is hidden or slow
+            window.addEventListener("load", function() {{
+                setTimeout(loadMath, 2000);
+            }});
+        </script>
+    """)
+
 # Setting up styling and scripts
 ui.HTML("""
-    <script type="text/javascript" async 
-        src="https://cdnjs.cloudflare.com/ajax/libs/mathjax/2.7.7/MathJax.js?config=TeX-MML-AM_CHTML">
-    </script>
-
     <style>
         .tooltip-custom {
             position: relative;
@@ -275,27 +144,96 @@ ui.HTML("""
             opacity: 1;
             visibility: visible;
         }
+
+        /* Equations laid out on the server (SERVER_MATH), see texhtml.py */
+        .tex {
+            font-family: "Times New Roman", Times, serif;
+            white-space: nowrap;
+        }
+
+        .tex-frac {
+            display: inline-flex;
+            flex-direction: column;
+            vertical-align: middle;
+            text-align: center;
+            font-size: 85%;
+            margin: 0 0.1em;
+        }
+
+        .tex-num {
+            border-bottom: 1px solid currentColor;
+            padding: 0 0.15em;
+        }
+
+        .tex-fn {
+            margin: 0 0.1em 0 0.2em;
+        }
+
+        .tex-op {
+            margin: 0 0.25em;
+        }
     </style>
 
     <script>
         // Function to update MathJax rendering when new Shiny data is available
+        // (or the app's own renderer, if that's what's loaded, see MATHJAX_CDN)
         function updateMathJax() {
             if (window.MathJax) {
                 MathJax.Hub.Queue(["Typeset", MathJax.Hub]);
+            } else if (window.texMath) {
+                texMath.typeset(document.getElementById("calculations_mathjax"));
             }
         }
-        document.addEventListener("shiny:value", updateMathJax);
     </script>
 
-
     <script>
-        // Re-render MathJax on hover over the tooltip
-        document.querySelectorAll('data-tooltip').forEach(function(tooltip) {
-            tooltip.addEventListener('mouseenter', function() {
-                MathJax.Hub.Queue(["Typeset", MathJax.Hub]);
-            });
+        // Hovering over the equations highlights datapoints and parts of the plot.
+        // When the server has sent hoverRegions (see send_hover_regions), that's done
+        // right here in the browser with Plotly; otherwise the server is told and does it.
+        var hoverRegions = null;
+        Shiny.addCustomMessageHandler("hover_regions", function(regions) {
+            hoverRegions = regions;
         });
+
+        function hoverTooltip(inputId, hovered) {
+            if (!highlightOnClient(inputId, hovered)) {
+                Shiny.setInputValue(inputId, hovered ? "Hovered" : "Not Hovered", {priority: "event"});
+            }
+        }
+
+        // Returns false if this tooltip can't be highlighted in the browser
+        function highlightOnClient(inputId, hovered) {
+            var target = hoverRegions && hoverRegions.targets[inputId];
+            var plot = document.querySelector("#feature_plot .js-plotly-plot");
+            if (!target || !plot || !window.Plotly) {
+                return false;
+            }
+            var rect = hovered ? target.rect : [0, 0, 0, 0];
+            var shape = "shapes[" + hoverRegions.rect_shape + "].";
+            // The plot is a FigureWidget, which sends every change made in the browser back
+            // to the server unless it's marked like this. The highlight is only ever undone
+            // here too, so the server's copy of the plot doesn't need to know about it
+            var layout = {_doNotReportToPy: true};
+            layout[shape + "x0"] = rect[0];
+            layout[shape + "x1"] = rect[1];
+            layout[shape + "y0"] = rect[2];
+            layout[shape + "y1"] = rect[3];
+            if (!target.points) {
+                Plotly.relayout(plot, layout);
+                return true;
+            }
+            // Outline the points of the right class(es) on the right side(s), like points.highlight does
+            var widths = hoverRegions.sides.map(function(sides, label) {
+                var right_class = target.label === null || target.label === label;
+                return sides.map(function(side) {
+                    return hovered && right_class && (target.side === null || target.side === side) ? 2 : 0;
+                });
+            });
+            Plotly.update(plot, {"marker.line.width": widths, _doNotReportToPy: true}, layout, hoverRegions.traces);
+            return true;
+        }
     </script>
+
 """)
 
 
@@ -303,16 +241,24 @@ ui.HTML("""
 with ui.sidebar(open="open", bg="#f8f8f8"):
     ui.HTML('<b>Split Selection</b>')
     ui.input_switch("vertical", "Vertical Split", True)  
+    # Everything that depends on the split follows these rather than the inputs,
+    # so a drag only recomputes a few times and always ends on where it was let go
+    vertical_input = throttle(SPLIT_THROTTLE, input.vertical)
+    split_loc_input = throttle(SPLIT_THROTTLE, input.split_loc)
+
     @reactive.effect
-    @reactive.event(input.vertical)
+    @instrument
     def change_split_direction():
-        vertical_split.set(input.vertical())
+        state.vertical_split.set(vertical_input())
     
-    ui.input_slider("split_loc", "Split Location", 0, 10, 3, step=0.5),
+    ui.input_slider("split_loc", "Split Location", SPLIT_MIN, SPLIT_MAX, 3, step=SPLIT_STEP),
     @reactive.effect
-    @reactive.event(input.split_loc)
+    @instrument
     def change_split_location():
-        split_loc.set(input.split_loc())
+        state.split_loc.set(split_loc_input())
+
+    # Overlay the split with the highest information gain, to compare against
+    ui.input_switch("show_best", "Show best split", False)
 
     ui.hr(style="margin-bottom: 5px;"),
 
@@ -321,173 +267,385 @@ with ui.sidebar(open="open", bg="#f8f8f8"):
     ui.div(
         ui.input_numeric("xcoord", "Width in cm (0-10)", 1, min=0, max=10),
         ui.input_numeric("ycoord", "Height in cm (0-10)", 1, min=0, max=10),
-        ui.input_select("select_add", "Select what datapoint to add:", {"Orange": "Orange", "Lemon": "Lemon"}),
+        ui.input_select("select_add", "Select what datapoint to add:", list(LABELS)),
         ui.input_action_button("add_dp", "Add", style="color: #fff; background-color: #337ab7; border-color: #2e6da4; width: 100%; heigth: 70%;"),
         class_="gap-0 mb-0"
     )
 
-    @reactive.effect
-    @reactive.event(input.xcoord)
-    def yvalue():
-        x_coord.set(input.xcoord())
-    
-    @reactive.effect
-    @reactive.event(input.ycoord)
-    def yvalue():
-        y_coord.set(input.ycoord())
-    
+    # Only checked once typing has stopped, so the message doesn't flash up
+    # halfway through typing a number (Add itself always reads the boxes directly)
+    xcoord_input = debounce(COORD_DEBOUNCE, input.xcoord)
+    ycoord_input = debounce(COORD_DEBOUNCE, input.ycoord)
+
     @render.text()
+    @instrument
     def error_check():
-        if not isinstance(input.ycoord(), int):
+        if not isinstance(xcoord_input(), int) or not isinstance(ycoord_input(), int):
             return "Invalid input"
 
     @reactive.effect
     @reactive.event(input.add_dp)
+    @instrument
     def add_dp():
-        if input.select_add() == "Orange":
-            curr_points = o_points.get()
-            updated_points = {
-                'x': curr_points['x'] + [x_coord.get()],
-                'y': curr_points['y'] + [y_coord.get()],
-            }
-            o_points.set(updated_points)
-            o_outline_width.get().append(0)
-        else:
-            curr_points = l_points.get()
-            updated_points = {
-                'x': curr_points['x'] + [x_coord.get()],
-                'y': curr_points['y'] + [y_coord.get()],
-            }
-            l_points.set(updated_points)
-            l_outline_width.get().append(0)
+        if state.is_full():
+            ui.notification_show(f"This dataset is full ({MAX_POINTS} datapoints max)", type="warning")
+            return
+        # Straight from the inputs, so clicking Add right after typing doesn't
+        # wait for the debounce above
+        state.x_coord.set(input.xcoord())
+        state.y_coord.set(input.ycoord())
+        if state.x_coord.get() is None or state.y_coord.get() is None:
+            return
+        state.points.append(state.x_coord.get(), state.y_coord.get(), LABELS[input.select_add()])
+        state.points_changed()
     
     ui.hr(style="margin-top: 5px; margin-bottom: 5px;"),
 
     ui.HTML('<b>Datapoint Removal</b>')
 
     ui.div(
-        ui.input_select("select_remove", "Select a datapoint to remove (the latest one will be removed):", {"Orange": "Orange", "Lemon": "Lemon"}),
+        ui.input_select("select_remove", "Select a datapoint to remove (the latest one will be removed):", list(LABELS)),
         ui.input_action_button("remove_dp", "Remove", style="color: #fff; background-color: #337ab7; border-color: #2e6da4; width: 100%; heigth: 70%;"),
         class_="gap-0"
     )
 
     @reactive.effect
     @reactive.event(input.remove_dp)
+    @instrument
     def remove_dp():
-        if input.select_remove() == "Orange":
-            curr_points = o_points.get()
-            if len(curr_points['x']) > 0:
-                curr_points['x'].pop()
-                curr_points['y'].pop()
-                updated_points = {
-                    'x': curr_points['x'],
-                    'y': curr_points['y'],
-                }
-                o_points.set(updated_points)
-                o_outline_width.get().pop()
-        else:
-            curr_points = l_points.get()
-            if len(curr_points['x']) > 0:
-                curr_points['x'].pop()
-                curr_points['y'].pop()
-                updated_points = {
-                    'x': curr_points['x'],
-                    'y': curr_points['y'],
-                }
-                l_points.set(updated_points)
-                l_outline_width.get().pop()
+        if state.points.pop(LABELS[input.select_remove()]):
+            state.points_changed()
 
-with ui.layout_columns():
-    # Dataset card
-    with ui.card():
-        ui.card_header("Dataset", style="font-size: 20px;")
-        # Plot where students will be putting datapoints and split
-        @render_plotly
-        def feature_plot():
-            fig = go.Figure()
-            # fig.update_layout(
-            #     height=500,
-            #     margin=dict(t=10, b=10, l=10, r=10)  # Adjust the margins if needed
-            # )
-            # Highlights from tooltip
-            fig.add_shape(
-                type="rect",
-                x0=rect_coords.get()[0],
-                x1=rect_coords.get()[1],
-                y0=rect_coords.get()[2],
-                y1=rect_coords.get()[3],
-                fillcolor="yellow",
-                opacity=0.2
+    ui.hr(style="margin-top: 5px; margin-bottom: 5px;"),
+
+    ui.HTML('<b>Bulk Edits</b>')
+
+    ui.div(
+        ui.input_numeric("n_random", "How many random datapoints to add:", 10, min=1, max=MAX_POINTS),
+        ui.input_action_button("add_random", "Add random", style="color: #fff; background-color: #337ab7; border-color: #2e6da4; width: 100%; heigth: 70%;"),
+        ui.input_select("select_side", "Remove every datapoint on one side of the split:", {"0": "Left of/below the split", "1": "Right of/above the split"}),
+        ui.input_action_button("remove_side", "Remove side", style="color: #fff; background-color: #337ab7; border-color: #2e6da4; width: 100%; heigth: 70%;"),
+        ui.input_action_button("clear_points", "Remove all datapoints", style="width: 100%; heigth: 70%; margin-top: 5px;"),
+        class_="gap-0"
+    )
+
+    # Each of these changes many points at once, inside one state.batch(),
+    # so everything that depends on the points only updates once
+
+    @reactive.effect
+    @reactive.event(input.add_random)
+    @instrument
+    def add_random():
+        n = input.n_random()
+        # Empty, a decimal or not positive
+        if not isinstance(n, int) or n < 1:
+            ui.notification_show("Enter a whole number of datapoints to add (1 or more)", type="warning")
+            return
+        if state.is_full():
+            ui.notification_show(f"This dataset is full ({MAX_POINTS} datapoints max)", type="warning")
+            return
+        n = min(n, state.room())
+        with state.batch() as points:
+            points.extend(*random_points(n, SPLIT_MIN, SPLIT_MAX, state.rng))
+
+    @reactive.effect
+    @reactive.event(input.remove_side)
+    @instrument
+    def remove_side():
+        # Same sides as the equations (region_masks is defined with them below)
+        mask = region_masks().get(side=int(input.select_side()))
+        with state.batch() as points:
+            points.remove(mask)
+
+    @reactive.effect
+    @reactive.event(input.clear_points)
+    @instrument
+    def clear_points():
+        with state.batch() as points:
+            points.clear()
+
+    ui.hr(style="margin-top: 5px; margin-bottom: 5px;"),
+
+    ui.HTML('<b>Load/Save Datapoints</b>')
+
+    ui.div(
+        ui.input_file("upload", "Load datapoints from a file (replaces the current ones):", accept=[f".{fmt}" for fmt in AVAILABLE_FORMATS]),
+        ui.input_switch("clip_upload", "Move datapoints outside 0-10 onto the edge (instead of leaving them out)", True),
+        ui.input_select("download_format", "Save as:", list(AVAILABLE_FORMATS)),
+        class_="gap-0"
+    )
+
+    @render.download_button(label="Save", filename=lambda: f"datapoints.{input.download_format()}")
+    @instrument
+    def download_points():
+        yield write_points(state.points, input.download_format())
+
+    # The whole file replaces the points at once (see dataio.py), so
+    # everything that depends on the points only updates once
+    @reactive.effect
+    @reactive.event(input.upload)
+    @instrument
+    def load_points():
+        file = input.upload()[0]
+        try:
+            x, y, label, report = read_points(
+                file["datapath"], file_format(file["name"]), SPLIT_MIN, SPLIT_MAX,
+                clip=input.clip_upload(), limit=MAX_POINTS
             )
-            # Orange points
-            fig.add_trace(go.Scatter(
-                x=o_points.get()['x'],
-                y=o_points.get()['y'],
-                mode='markers',
-                name='Orange',
-                marker=dict(
-                    color='#FF7400',
-                    size=12,
-                    symbol='circle',
-                    line=dict(
-                        color=['black']*len(o_outline_width.get()),  # Outline for some points
-                        width=o_outline_width.get()  # 0 width removes outline for some points
-                    )
-                )
-            ))
-            # Lemon points
-            fig.add_trace(go.Scatter(
-                x=l_points.get()['x'],
-                y=l_points.get()['y'],
-                mode='markers',
-                name='Lemon',
-                marker=dict(
-                    color='#5B1EE5',
-                    size=12,
-                    symbol='triangle-up',
-                    line=dict(
-                        color=['black']*len(l_outline_width.get()),  # Outline for some points
-                        width=l_outline_width.get()  # 0 width removes outline for some points
+        except (ValueError, ImportError) as e:
+            ui.notification_show(f"Couldn't load {file['name']}: {e}", type="error")
+            return
+        # Keep the current points rather than swap them for nothing
+        if len(x) == 0:
+            ui.notification_show(
+                f"Couldn't load {file['name']}: it has no usable datapoints ({report['dropped']} rows left out)",
+                type="error"
+            )
+            return
+        with state.batch() as points:
+            points.clear()
+            points.extend(x, y, label)
+        message = f"Loaded {len(x)} datapoints from {file['name']}"
+        if report['dropped']:
+            message += f" ({report['dropped']} rows left out)"
+        if report['truncated']:
+            message += f", stopping at the {MAX_POINTS} datapoint limit"
+        ui.notification_show(message, type="warning" if report['dropped'] or report['truncated'] else "message")
+
+    ui.hr(style="margin-top: 5px; margin-bottom: 5px;"),
+
+    ui.HTML('<b>Decision Tree</b>')
+
+    ui.div(
+        ui.input_switch("show_tree", "Grow a full decision tree", False),
+        ui.input_numeric("max_depth", "Max depth", 3, min=1, max=10),
+        ui.input_numeric("min_samples_leaf", "Min datapoints per leaf", 1, min=1),
+        ui.input_numeric("min_gain", "Min information gain to split", 0, min=0, max=1, step=0.01),
+        class_="gap-0"
+    )
+
+with ui.layout_columns():
+    with ui.div(class_="d-flex flex-column gap-3"):
+        # Dataset card
+        with ui.card():
+            ui.card_header("Dataset", style="font-size: 20px;")
+            # Plot where students will be putting datapoints and split
+            # It's only built once per session: after that the patch_* effects below
+            # change just the parts of it that need changing (the outline widths, the
+            # highlight rectangle, the split line...), so a hover or slider move only
+            # sends those few values to the browser instead of the whole figure
+            @render_plotly
+            @instrument
+            def feature_plot():
+                fig = feature_figure(CLASSES, SPLIT_MIN, SPLIT_MAX)
+                with reactive.isolate():
+                    draw_points(fig, state.get_highlighted_points(), SPLIT_MIN, SPLIT_MAX)
+                    draw_highlight_rect(fig, state.rect_coords.get())
+                    draw_split(fig, state.vertical_split.get(), state.split_loc.get())
+                    draw_best_split(fig, optimal_splits() if input.show_best() else None)
+                    draw_regions(fig, decision_regions() if input.show_tree() else None)
+                return fig
+
+            def draw_highlight_rect(fig, rect_coords):
+                x0, x1, y0, y1 = rect_coords
+                fig.layout.shapes[RECT_SHAPE].update(x0=x0, x1=x1, y0=y0, y1=y1)
+
+            def draw_split(fig, vertical, split_loc):
+                fig.layout.shapes[SPLIT_SHAPE].update(split_line(X_AXIS if vertical else Y_AXIS, split_loc))
+
+            def draw_best_split(fig, splits):
+                # splits is optimal_splits(), or None to hide the line
+                with fig.batch_update():
+                    shape = fig.layout.shapes[BEST_SHAPE]
+                    annotation = fig.layout.annotations[BEST_ANNOTATION]
+                    if not splits:
+                        shape.visible = False
+                        annotation.visible = False
+                        return
+                    best = splits[0]
+                    shape.update(visible=True, **split_line(best['axis'], best['threshold']))
+                    annotation.update(
+                        visible=True,
+                        text=f"Best split (IG ≈ {best['infogain']})",
+                        **split_label(best['axis'], best['threshold'])
                     )
+
+            def draw_regions(fig, boxes):
+                # boxes is decision_regions(), or None to hide the shading
+                # Swaps the old tree's rectangles for the new one's, keeping the shapes before them
+                fig.layout.shapes = fig.layout.shapes[:REGION_SHAPES] + tuple(region_shapes(boxes or [], CLASSES))
+
+            @reactive.effect
+            @instrument
+            def patch_points():
+                points = state.get_highlighted_points()
+                if feature_plot.widget is not None:
+                    draw_points(feature_plot.widget, points, SPLIT_MIN, SPLIT_MAX)
+
+            @reactive.effect
+            @instrument
+            def patch_highlight_rect():
+                rect_coords = state.rect_coords.get()
+                if feature_plot.widget is not None:
+                    draw_highlight_rect(feature_plot.widget, rect_coords)
+
+            @reactive.effect
+            @instrument
+            def patch_split():
+                vertical = state.vertical_split.get()
+                split_loc = state.split_loc.get()
+                if feature_plot.widget is not None:
+                    draw_split(feature_plot.widget, vertical, split_loc)
+
+            @reactive.effect
+            @instrument
+            def patch_best_split():
+                splits = optimal_splits() if input.show_best() else None
+                if feature_plot.widget is not None:
+                    draw_best_split(feature_plot.widget, splits)
+
+            # Only recomputes the regions while they're being shown
+            @reactive.effect
+            @instrument
+            def patch_regions():
+                regions = decision_regions() if input.show_tree() else None
+                if feature_plot.widget is not None:
+                    draw_regions(feature_plot.widget, regions)
+
+            # Counts and information gain at every slider position for both split directions
+            # Only recomputed when the datapoints change, so moving the slider is a lookup
+            @reactive.calc
+            @instrument
+            def split_curve():
+                points = state.get_points()
+                thresholds = np.arange(SPLIT_MIN, SPLIT_MAX + SPLIT_STEP, SPLIT_STEP)
+                tables = {}
+                gains = {}
+                for axis in (X_AXIS, Y_AXIS):
+                    tables[axis] = points.index.count_splits(axis, thresholds)
+                    # No gain to plot if one side of the split is empty
+                    gains[axis] = [
+                        table_infogain(table) if table.sum(axis=1).all() else None
+                        for table in tables[axis]
+                    ]
+                return {'thresholds': thresholds, 'tables': tables, 'gains': gains}
+
+            # Top splits over both axes, recomputed only when the datapoints change
+            @reactive.calc
+            @instrument
+            def optimal_splits():
+                points = state.get_points()
+                return best_splits(points.x, points.y, points.label, k=3, n_classes=N_CLASSES)
+
+            @render.ui
+            @instrument
+            def best_split_list():
+                if not input.show_best():
+                    return None
+                if not optimal_splits():
+                    return ui.p("No valid splits for this dataset.")
+                items = []
+                for split in optimal_splits():
+                    axis = "Width" if split['axis'] == X_AXIS else "Height"
+                    items.append(ui.tags.li(f"{axis} < {split['threshold']:g}: IG ≈ {split['infogain']}"))
+                return ui.div(ui.HTML("<b>Best splits</b>"), ui.tags.ol(*items), style="font-size: 14px;")
+
+            # Tree grown from all the datapoints, refit whenever they or the tree settings change
+            @reactive.calc
+            @instrument
+            def fitted_tree():
+                points = state.get_points()
+                # Fall back to the defaults while a box is empty/invalid
+                max_depth = input.max_depth() if isinstance(input.max_depth(), int) else 3
+                min_samples_leaf = input.min_samples_leaf() if isinstance(input.min_samples_leaf(), int) else 1
+                min_gain = input.min_gain() if isinstance(input.min_gain(), (int, float)) else 0
+                return fit_tree(
+                    points.x, points.y, points.label,
+                    n_classes=N_CLASSES,
+                    max_depth=max(1, max_depth),
+                    min_samples_leaf=max(1, min_samples_leaf),
+                    min_gain=max(0, min_gain),
                 )
-            ))
-            # Make plot
-            fig.update_layout(
-                xaxis=dict(
-                    range=[0, 10],
-                    fixedrange=True,  # Locks zooming
-                    dtick=1,
-                    showgrid=True,
-                    gridcolor='rgba(0, 0, 0, 0.1)',
-                    gridwidth=1
-                ),
-                yaxis=dict(
-                    range=[0, 10],
-                    fixedrange=True,  # Locks zooming
-                    dtick=1,
-                    showgrid=True,
-                    gridcolor='rgba(0, 0, 0, 0.1)',
-                    gridwidth=1
-                ),
-                xaxis_title="Width (cm)",
-                yaxis_title="Height (cm)",
-                showlegend=True,
-                plot_bgcolor='white',
-                dragmode=False,  # Disables all drag interactions
-                modebar=dict(
-                    remove=["select2d", "lasso2d"]
-                )
-            )
 
-            # Split location
-            if (vertical_split.get()):
-                fig.add_vline(x=split_loc.get(), line=dict(color="blue", width=2, dash="dash"), name="Vertical Line")
-            else:
-                fig.add_hline(y=split_loc.get(), line=dict(color="blue", width=2, dash="dash"), name="Horizontal Line")
-            
-            return fig
+            # The part of the plane each leaf covers and what it predicts there,
+            # only recomputed when the tree changes
+            @reactive.calc
+            @instrument
+            def decision_regions():
+                return fitted_tree().leaf_boxes(SPLIT_MIN, SPLIT_MAX)
+
+            @render.ui
+            @instrument
+            def tree_rules():
+                if not input.show_tree():
+                    return None
+                lines = fitted_tree().rules(["width", "height"], CLASSES)
+                return ui.div(
+                    ui.HTML("<b>Decision tree</b>"),
+                    ui.tags.pre("\n".join(lines), style="font-size: 13px;"),
+                    style="font-size: 14px;"
+                )
         
-        # Buttons to add datapoints
+        # Information gain for every slider position, for both split directions
+        with ui.card():
+            ui.card_header("Information gain by split location", style="font-size: 20px;")
+
+            # Built once per session like feature_plot, then patch_ig_curve and
+            # move_ig_curve_marker below update it in place
+            @render_plotly
+            @instrument
+            def ig_curve():
+                with reactive.isolate():
+                    curve = split_curve()
+                    split = state.split_loc.get()
+                fig = go.Figure()
+                fig.add_trace(go.Scatter(
+                    x=curve['thresholds'],
+                    y=curve['gains'][X_AXIS],
+                    mode='lines+markers',
+                    name='Vertical split (width)',
+                    line=dict(color='#1F4A89'),
+                ))
+                fig.add_trace(go.Scatter(
+                    x=curve['thresholds'],
+                    y=curve['gains'][Y_AXIS],
+                    mode='lines+markers',
+                    name='Horizontal split (height)',
+                    line=dict(color='#F79709'),
+                ))
+                # Current split location, moved by move_ig_curve_marker below
+                fig.add_vline(x=split, line=dict(color="blue", width=2, dash="dash"))
+                fig.update_layout(
+                    xaxis=dict(range=[SPLIT_MIN, SPLIT_MAX], fixedrange=True, dtick=1),
+                    yaxis=dict(rangemode='tozero', fixedrange=True),
+                    xaxis_title="Split location (cm)",
+                    yaxis_title="Information gain",
+                    plot_bgcolor='white',
+                    dragmode=False,
+                    height=250,
+                    margin=dict(t=10, b=10, l=10, r=10),
+                )
+                return fig
+
+            # When the datapoints change, only the two curves' gains are sent
+            @reactive.effect
+            @instrument
+            def patch_ig_curve():
+                curve = split_curve()
+                fig = ig_curve.widget
+                if fig is not None:
+                    with fig.batch_update():
+                        fig.data[0].y = curve['gains'][X_AXIS]
+                        fig.data[1].y = curve['gains'][Y_AXIS]
+
+            # Moving the slider only moves the marker on the existing plot, instead of redrawing it
+            @reactive.effect
+            @instrument
+            def move_ig_curve_marker():
+                split = state.split_loc.get()
+                fig = ig_curve.widget
+                if fig is not None and fig.layout.shapes:
+                    fig.layout.shapes[0].update(x0=split, x1=split)
 
     # Calculations card
     with ui.card():
@@ -507,8 +665,9 @@ with ui.layout_columns():
         ),
 
         @render.ui()
+        @instrument
         def show_toggling():
-            if notation.get():
+            if state.notation.get():
                 return ui.p(
                     ui.HTML("""
                         <div style="text-align: center; font-size: 24px; font-weight: normal; color: #9370DB;">
@@ -562,7 +721,7 @@ with ui.layout_columns():
                         </div>
                     """)
                 )
-            elif variables.get():
+            elif state.variables.get():
                 return ui.p(
                     ui.HTML("""  
                         <div style="text-align: center; font-size: 24px; font-weight: normal; color: #1F4A89;">
@@ -603,7 +762,7 @@ with ui.layout_columns():
                         </div>
                     """)
                 )
-            elif definition.get():
+            elif state.definition.get():
                 return ui.p(
                     ui.HTML("""
                         <div style="text-align: center; font-size: 24px; font-weight: normal; color: #1F4A89;">
@@ -634,62 +793,42 @@ with ui.layout_columns():
         
         # Helper function to calculate information gain
         def calculate():
-            valid = 1
-            side1 = "left" if vertical_split.get() else "below"
-            side2 = "right" if vertical_split.get() else "above"
-            side1_orange = 0
-            side2_orange = 0
-            side1_lemon = 0
-            side2_lemon = 0
-            for (x, y) in zip(o_points.get()['x'], o_points.get()['y']):
-                if (vertical_split.get() and x < split_loc.get()) or (not vertical_split.get() and y < split_loc.get()):
-                    side1_orange += 1
-                else:
-                    side2_orange += 1
-            for (x, y) in zip(l_points.get()['x'], l_points.get()['y']):
-                if (vertical_split.get() and x < split_loc.get()) or (not vertical_split.get() and y < split_loc.get()):
-                    side1_lemon += 1
-                else:
-                    side2_lemon += 1
-            oranges = side1_orange + side2_orange
-            lemons = side1_lemon + side2_lemon
-            total = oranges + lemons
-            side1s = side1_orange + side1_lemon
-            side2s = side2_orange + side2_lemon
-            if side1s == 0 or side2s == 0:
-                valid = 0
-                info = {'valid': valid}
+            vertical = state.vertical_split.get()
+            axis = X_AXIS if vertical else Y_AXIS
+            # table[side, label] counts, see splits.py
+            # Every slider position is already counted in split_curve(), so this is normally just a lookup
+            curve = split_curve()
+            step_index = (state.split_loc.get() - SPLIT_MIN) / SPLIT_STEP
+            if step_index == int(step_index) and 0 <= step_index < len(curve['thresholds']):
+                table = curve['tables'][axis][int(step_index)]
             else:
-                h_y = calculate_entropy(lemons, oranges, total)
-                h_yside1 = calculate_entropy(side1_lemon, side1_orange, side1s)
-                h_yside2 = calculate_entropy(side2_lemon, side2_orange, side2s)
-                h_yx = calculate_condent(side1s, side2s, total, h_yside1, h_yside2)
-                infogain = calculate_infogain(h_y, h_yx)
-                info = {'valid': valid, 'side1': side1, 'side2': side2, 'side1_orange': side1_orange,
-                        'side2_orange': side2_orange, 'side1_lemon': side1_lemon, 'side2_lemon': side2_lemon,
-                        'oranges': oranges, 'lemons': lemons, 'total': total,
-                        'side1s': side1s, 'side2s': side2s, 'h_y': h_y,
-                        'h_yside1': h_yside1, 'h_yside2': h_yside2, 'h_yx': h_yx,
-                        'infogain': infogain}
+                table = state.get_points().index.count_split(axis, state.split_loc.get())
+            # The numbers come from split_info in entropy.py, this just adds the side names
+            info = split_info(table)
+            if info['valid'] == 1:
+                info['side1'] = "left" if vertical else "below"
+                info['side2'] = "right" if vertical else "above"
             return info
 
-        # Helper function to make tooltips
-        def tooltip_test(id, tip, content):
-            return f"""<span id="{id}" class="tooltip-custom" data-tooltip="{tip}">\\( {content} \\)</span>"""
-
         # Render calculations
         @render.ui
+        @instrument
         def calculations_mathjax():
             info = calculate()
             if info['valid'] == 1:
-                return ui.HTML(create_mathjax_content(info))
+                html = create_mathjax_content(info, state.step.get(), prerender=SERVER_MATH)
             else:
-                return ui.HTML('<div style="text-align: center; font-size: 20px; font-weight: normal; color: #1F4A89; line-height: 1;">Invalid split - no information is gained from this split!</div>')
+                html = '<div style="text-align: center; font-size: 20px; font-weight: normal; color: #1F4A89; line-height: 1;">Invalid split - no information is gained from this split!</div>'
+            # Nothing to do if it's the same as what's already showing (e.g. the slider moved
+            # but no points changed sides), which also saves MathJax typesetting it again
+            req(html != state.shown_calculations, cancel_output=True)
+            state.shown_calculations = html
+            return ui.HTML(html)
         
         # Render rectangles
         # @render.ui
         # def rectangle_highlights():
-        #     if show_rect.get() == 1:
+        #     if state.show_rect.get() == 1:
         #         return ui.HTML(
         #             """
         #             <div id="rectangle" style="width: 400px; height: 50px; background-color: rgb(247, 186, 186); 
@@ -698,7 +837,7 @@ with ui.layout_columns():
         #             </div>
         #             """
         #         )
-        #     if show_rect.get() == 2:
+        #     if state.show_rect.get() == 2:
         #         return ui.HTML(
         #             """
         #             <div id="rectangle" style="width: 533px; height: 110px; background-color: rgb(247, 186, 186); 
@@ -711,376 +850,130 @@ with ui.layout_columns():
         # All these functions are to make correspondings changes to the plot based on user mouse hovering (tooltips)
         @reactive.effect
         @reactive.event(input.btn_Hy)
+        @instrument
         def highlight_Hy_eq():
             tooltip_state = input.btn_Hy()
             if tooltip_state == "Hovered":
-                show_rect.set(1)
+                state.show_rect.set(1)
             else:
-                show_rect.set(0)
+                state.show_rect.set(0)
         
         @reactive.effect
         @reactive.event(input.btn_Hyx)
+        @instrument
         def highlight_Hyx_eq():
             tooltip_state = input.btn_Hyx()
             if tooltip_state == "Hovered":
-                show_rect.set(2)
+                state.show_rect.set(2)
             else:
-                show_rect.set(0)
-            
-        @reactive.effect
-        @reactive.event(input.btn_side2)
-        def highlight_side1():
-            tooltip_state = input.btn_side2()
-            o_copy = o_outline_width.get()[:]
-            l_copy = l_outline_width.get()[:]
-            rect_copy = rect_coords.get()[:]
-
-            if tooltip_state == "Hovered":
-                for i in range(len(o_copy)):
-                    if vertical_split.get() == True and o_points.get()['x'][i] > split_loc.get():
-                        o_copy[i] = 2
-                    if vertical_split.get() == False and o_points.get()['y'][i] > split_loc.get():
-                        o_copy[i] = 2
-                for i in range(len(l_copy)):
-                    if vertical_split.get() == True and l_points.get()['x'][i] > split_loc.get():
-                        l_copy[i] = 2  # Change outline width to 2 when hovered
-                    if vertical_split.get() == False and l_points.get()['y'][i] > split_loc.get():
-                        l_copy[i] = 2
-            
-                rect_copy[0] = 0
-                rect_copy[1] = 10
-                rect_copy[2] = 0
-                rect_copy[3] = 10
-                rect_coords.set(rect_copy)
-            elif tooltip_state == "Not Hovered":
-                for i in range(len(o_copy)):
-                    o_copy[i] = 0
-                for i in range(len(l_copy)):
-                    l_copy[i] = 0
-                rect_copy[0] = 0
-                rect_copy[1] = 0
-                rect_copy[2] = 0
-                rect_copy[3] = 0
-                rect_coords.set(rect_copy)
-            o_outline_width.set(o_copy)
-            l_outline_width.set(l_copy)
-
-        @reactive.effect
-        @reactive.event(input.btn_side1)
-        def highlight_side1():
-            tooltip_state = input.btn_side1()
-            o_copy = o_outline_width.get()[:]
-            l_copy = l_outline_width.get()[:]
-            rect_copy = rect_coords.get()[:]
-
-            if tooltip_state == "Hovered":
-                for i in range(len(o_copy)):
-                    if vertical_split.get() == True and o_points.get()['x'][i] < split_loc.get():
-                        o_copy[i] = 2
-                    if vertical_split.get() == False and o_points.get()['y'][i] < split_loc.get():
-                        o_copy[i] = 2
-                for i in range(len(l_copy)):
-                    if vertical_split.get() == True and l_points.get()['x'][i] < split_loc.get():
-                        l_copy[i] = 2  # Change outline width to 2 when hovered
-                    if vertical_split.get() == False and l_points.get()['y'][i] < split_loc.get():
-                        l_copy[i] = 2
-            
-                rect_copy[0] = 0
-                rect_copy[1] = 10
-                rect_copy[2] = 0
-                rect_copy[3] = 10
-                rect_coords.set(rect_copy)
-            elif tooltip_state == "Not Hovered":
-                for i in range(len(o_copy)):
-                    o_copy[i] = 0
-                for i in range(len(l_copy)):
-                    l_copy[i] = 0
-                rect_copy[0] = 0
-                rect_copy[1] = 0
-                rect_copy[2] = 0
-                rect_copy[3] = 0
-                rect_coords.set(rect_copy)
-            o_outline_width.set(o_copy)
-            l_outline_width.set(l_copy)
-
-        @reactive.effect
-        @reactive.event(input.btn_oranges_side2)
-        def highlight_orange_side2():
-            tooltip_state = input.btn_oranges_side2()
-            o_copy = o_outline_width.get()[:]
-            rect_copy = rect_coords.get()[:]
-
-            if tooltip_state == "Hovered":
-                for i in range(len(o_copy)):
-                    if vertical_split.get() == True and o_points.get()['x'][i] >= split_loc.get():
-                        o_copy[i] = 2
-                    if vertical_split.get() == False and o_points.get()['y'][i] >= split_loc.get():
-                        o_copy[i] = 2
-                if vertical_split.get() == True:
-                    rect_copy[0] = 10
-                    rect_copy[1] = split_loc.get()
-                    rect_copy[2] = 10
-                    rect_copy[3] = 0
-                    rect_coords.set(rect_copy)
-                else:
-                    rect_copy[0] = 0
-                    rect_copy[1] = 10
-                    rect_copy[2] = split_loc.get()
-                    rect_copy[3] = 10
-                    rect_coords.set(rect_copy)
-            elif tooltip_state == "Not Hovered":
-                for i in range(len(o_copy)):
-                    o_copy[i] = 0
-                rect_copy[0] = 0
-                rect_copy[1] = 0
-                rect_copy[2] = 0
-                rect_copy[3] = 0
-                rect_coords.set(rect_copy)
-            o_outline_width.set(o_copy)
-
-        @reactive.effect
-        @reactive.event(input.btn_lemons_side2)
-        def highlight_lemons_side2():
-            tooltip_state = input.btn_lemons_side2()
-            # Get the current outline width
-            l_copy = l_outline_width.get()[:]
-            rect_copy = rect_coords.get()[:]
+                state.show_rect.set(0)
             
-            if tooltip_state == "Hovered":
-                # Logic for when the tooltip is hovered
-                for i in range(len(l_copy)):
-                    if vertical_split.get() == True and l_points.get()['x'][i] >= split_loc.get():
-                        l_copy[i] = 2  # Change outline width to 2 when hovered
-                    if vertical_split.get() == False and l_points.get()['y'][i] >= split_loc.get():
-                        l_copy[i] = 2
-                if vertical_split.get() == True:
-                    rect_copy[0] = 10
-                    rect_copy[1] = split_loc.get()
-                    rect_copy[2] = 10
-                    rect_copy[3] = 0
-                    rect_coords.set(rect_copy)
-                else:
-                    rect_copy[0] = 0
-                    rect_copy[1] = 10
-                    rect_copy[2] = split_loc.get()
-                    rect_copy[3] = 10
-                    rect_coords.set(rect_copy)
-            elif tooltip_state == "Not Hovered":
-                # Logic for when the tooltip is not hovered
-                for i in range(len(l_copy)):
-                    l_copy[i] = 0
-                rect_copy[0] = 0
-                rect_copy[1] = 0
-                rect_copy[2] = 0
-                rect_copy[3] = 0
-                rect_coords.set(rect_copy)
-
-            # Set the updated outline width
-            l_outline_width.set(l_copy)
-        
-        @reactive.effect
-        @reactive.event(input.btn_X_side2)
-        def highlight_side2():
-            tooltip_state = input.btn_X_side2()
-            rect_copy = rect_coords.get()[:]
-            
-            if tooltip_state == "Hovered":
-                if vertical_split.get() == True:
-                    rect_copy[0] = 10
-                    rect_copy[1] = split_loc.get()
-                    rect_copy[2] = 10
-                    rect_copy[3] = 0
-                    rect_coords.set(rect_copy)
-                else:
-                    rect_copy[0] = 0
-                    rect_copy[1] = 10
-                    rect_copy[2] = split_loc.get()
-                    rect_copy[3] = 10
-                    rect_coords.set(rect_copy)
-            elif tooltip_state == "Not Hovered":
-                rect_copy[0] = 0
-                rect_copy[1] = 0
-                rect_copy[2] = 0
-                rect_copy[3] = 0
-                rect_coords.set(rect_copy)
-
-        @reactive.effect
-        @reactive.event(input.btn_oranges_side1)
-        def highlight_orange_side1():
-            tooltip_state = input.btn_oranges_side1()
-            o_copy = o_outline_width.get()[:]
-            rect_copy = rect_coords.get()[:]
-
-            if tooltip_state == "Hovered":
-                for i in range(len(o_copy)):
-                    if vertical_split.get() == True and o_points.get()['x'][i] < split_loc.get():
-                        o_copy[i] = 2
-                    if vertical_split.get() == False and o_points.get()['y'][i] < split_loc.get():
-                        o_copy[i] = 2
-                if vertical_split.get() == True:
-                    rect_copy[0] = 0
-                    rect_copy[1] = split_loc.get()
-                    rect_copy[2] = 10
-                    rect_copy[3] = 0
-                    rect_coords.set(rect_copy)
-                else:
-                    rect_copy[0] = 0
-                    rect_copy[1] = 10
-                    rect_copy[2] = split_loc.get()
-                    rect_copy[3] = 0
-                    rect_coords.set(rect_copy)
-            elif tooltip_state == "Not Hovered":
-                for i in range(len(o_copy)):
-                    o_copy[i] = 0
-                rect_copy[0] = 0
-                rect_copy[1] = 0
-                rect_copy[2] = 0
-                rect_copy[3] = 0
-                rect_coords.set(rect_copy)
-            o_outline_width.set(o_copy)
+        # Every group of points a tooltip can highlight, for the current points and split
+        # Only recomputed when those change, so hovering is just a lookup
+        @reactive.calc
+        @instrument
+        def region_masks():
+            points = state.get_points()
+            values = points.x if state.vertical_split.get() else points.y
+            return RegionMasks(values, points.label, state.split_loc.get(), N_CLASSES)
+
+        def current_hover_targets():
+            return hover_targets(
+                [class_key(cls) for cls in CLASSES],
+                state.vertical_split.get(), state.split_loc.get(), SPLIT_MIN, SPLIT_MAX
+            )
 
+        # Sends the browser everything it needs to do the hover highlighting itself:
+        # which side of the split every marker in each class's trace is on, and what each tooltip highlights.
+        # Only resent when the points or the split change, not on every hover
         @reactive.effect
-        @reactive.event(input.btn_lemons_side1)
-        def highlight_lemons_side1():
-            tooltip_state = input.btn_lemons_side1()
-            # Get the current outline width
-            l_copy = l_outline_width.get()[:]
-            rect_copy = rect_coords.get()[:]
-            
-            if tooltip_state == "Hovered":
-                # Logic for when the tooltip is hovered
-                for i in range(len(l_copy)):
-                    if vertical_split.get() == True and l_points.get()['x'][i] < split_loc.get():
-                        l_copy[i] = 2  # Change outline width to 2 when hovered
-                    if vertical_split.get() == False and l_points.get()['y'][i] < split_loc.get():
-                        l_copy[i] = 2
-                if vertical_split.get() == True:
-                    rect_copy[0] = 0
-                    rect_copy[1] = split_loc.get()
-                    rect_copy[2] = 10
-                    rect_copy[3] = 0
-                    rect_coords.set(rect_copy)
-                else:
-                    rect_copy[0] = 0
-                    rect_copy[1] = 10
-                    rect_copy[2] = split_loc.get()
-                    rect_copy[3] = 0
-                    rect_coords.set(rect_copy)
-            elif tooltip_state == "Not Hovered":
-                # Logic for when the tooltip is not hovered
-                for i in range(len(l_copy)):
-                    l_copy[i] = 0
-                rect_copy[0] = 0
-                rect_copy[1] = 0
-                rect_copy[2] = 0
-                rect_copy[3] = 0
-                rect_coords.set(rect_copy)
-
-            # Set the updated outline width
-            l_outline_width.set(l_copy)
-        
-        @reactive.effect
-        @reactive.event(input.btn_X_side1)
-        def highlight_side1():
-            tooltip_state = input.btn_X_side1()
-            rect_copy = rect_coords.get()[:]
-            
-            if tooltip_state == "Hovered":
-                if vertical_split.get() == True:
-                    rect_copy[0] = 0
-                    rect_copy[1] = split_loc.get()
-                    rect_copy[2] = 10
-                    rect_copy[3] = 0
-                    rect_coords.set(rect_copy)
+        @instrument
+        async def send_hover_regions():
+            if not CLIENT_HOVER:
+                return
+            points = state.get_points()
+            mode = point_mode(len(points))
+            vertical = state.vertical_split.get()
+            split_loc = state.split_loc.get()
+            sides = []
+            for label in range(N_CLASSES):
+                # One side per marker, which is a grid cell rather than a point when binned
+                x, y, _, _ = class_markers(points, label, mode, SPLIT_MIN, SPLIT_MAX)
+                sides.append(((x if vertical else y) >= split_loc).astype(np.int8).tolist())
+            await session.send_custom_message("hover_regions", {
+                'traces': [class_trace(label, webgl=mode != SVG) for label in range(N_CLASSES)],
+                'sides': sides,
+                'targets': current_hover_targets(),
+                'rect_shape': RECT_SHAPE,
+            })
+
+        # Highlighting for every tooltip in hover_targets (btn_side1, btn_X_side2, btn_all_oranges,
+        # btn_lemons_side1, ...), made in a function so each one gets its own input id
+        def add_hover_highlight(input_id):
+            @reactive.effect
+            @reactive.event(input[input_id])
+            @instrument(name=f"highlight_{input_id}")
+            def highlight():
+                target = current_hover_targets()[input_id]
+                points = state.points
+                if input[input_id]() == "Hovered":
+                    if target['points']:
+                        points.highlight[:] = region_masks().get(target['label'], target['side'])
+                    state.rect_coords.set(target['rect'])
                 else:
-                    rect_copy[0] = 0
-                    rect_copy[1] = 10
-                    rect_copy[2] = split_loc.get()
-                    rect_copy[3] = 0
-                    rect_coords.set(rect_copy)
-            elif tooltip_state == "Not Hovered":
-                rect_copy[0] = 0
-                rect_copy[1] = 0
-                rect_copy[2] = 0
-                rect_copy[3] = 0
-                rect_coords.set(rect_copy)
+                    if target['points']:
+                        points.highlight[:] = False
+                    state.rect_coords.set([0, 0, 0, 0])
+                if target['points']:
+                    # Let the plot know the outline widths changed
+                    state.highlight_changed()
 
-        @reactive.effect
-        @reactive.event(input.btn_all_lemons)
-        def highlight_all_lemons():
-            tooltip_state = input.btn_all_lemons()
-            l_copy = l_outline_width.get()[:]   
-            rect_copy = rect_coords.get()[:]
-            if tooltip_state == "Hovered":
-                for i in range(len(l_copy)):
-                        l_copy[i] = 2
-                rect_copy[0] = 0
-                rect_copy[1] = 10
-                rect_copy[2] = 10
-                rect_copy[3] = 0
-                rect_coords.set(rect_copy)
-            elif tooltip_state == "Not Hovered":
-                for i in range(len(l_copy)):
-                    l_copy[i] = 0
-                rect_copy[0] = 0
-                rect_copy[1] = 0
-                rect_copy[2] = 0
-                rect_copy[3] = 0
-                rect_coords.set(rect_copy)
-            l_outline_width.set(l_copy)
-
-        @reactive.effect
-        @reactive.event(input.btn_all_oranges)
-        def highlight_all_oranges():
-            tooltip_state = input.btn_all_oranges()
-            o_copy = o_outline_width.get()[:]
-            rect_copy = rect_coords.get()[:]
-            if tooltip_state == "Hovered":
-                for i in range(len(o_copy)):
-                    o_copy[i] = 2
-                rect_copy[0] = 0
-                rect_copy[1] = 10
-                rect_copy[2] = 10
-                rect_copy[3] = 0
-                rect_coords.set(rect_copy)
-            elif tooltip_state == "Not Hovered":
-                for i in range(len(o_copy)):
-                    o_copy[i] = 0
-                rect_copy[0] = 0
-                rect_copy[1] = 0
-                rect_copy[2] = 0
-                rect_copy[3] = 0
-                rect_coords.set(rect_copy)
-            o_outline_width.set(o_copy)
+        # (the input ids don't depend on where the split is)
+        for input_id in hover_targets([class_key(cls) for cls in CLASSES], True, SPLIT_MIN, SPLIT_MIN, SPLIT_MAX):
+            add_hover_highlight(input_id)
 
         # Toggle buttons for notation, variables, and definition
         @reactive.effect
         @reactive.event(input.notation)
+        @instrument
         def toggle_notation():
-            notation.set(not notation.get())
-            variables.set(False)
-            definition.set(False)
+            state.notation.set(not state.notation.get())
+            state.variables.set(False)
+            state.definition.set(False)
             
         @reactive.effect
         @reactive.event(input.variables)
+        @instrument
         def toggle_variables():
-            variables.set(not variables.get())
-            notation.set(False)
-            definition.set(False)
+            state.variables.set(not state.variables.get())
+            state.notation.set(False)
+            state.definition.set(False)
         @reactive.effect
         @reactive.event(input.definition)
+        @instrument
         def toggle_definition():
-            definition.set(not definition.get())
-            notation.set(False)
-            variables.set(False)
+            state.definition.set(not state.definition.get())
+            state.notation.set(False)
+            state.variables.set(False)
 
         @reactive.effect
         @reactive.event(input.prev_step)
+        @instrument
         def go_back():
-            step.set(max(0, step.get()-1))
+            state.step.set(max(0, state.step.get()-1))
         
         @reactive.effect
         @reactive.event(input.next_step)
+        @instrument
         def go_forward():
-            step.set(min(5, step.get()+1))
-            print(step.get())
\ No newline at end of file
+            state.step.set(min(5, state.step.get()+1))
+            print(state.step.get())
+# What metrics.py has recorded (for every session on this worker), refreshed every few seconds
+if METRICS:
+    with ui.card():
+        ui.card_header("Debug: effect timings, what caused them, and bytes sent", style="font-size: 20px;")
+
+        @render.ui
+        def debug_panel():
+            reactive.invalidate_later(2)
+            return ui.HTML(summary_html())
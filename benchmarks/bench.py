@@ -0,0 +1,218 @@
+# Times the app's hot paths on made-up orange/lemon datasets of different sizes,
+# and checks them against the numbers saved in baseline.json:
+#     python benchmarks/bench.py              # compare against the baseline
+#     python benchmarks/bench.py --update     # save the current numbers as the new baseline
+#     python benchmarks/bench.py --sizes 10 1000 --only hover figure
+# For every case and dataset size it records the fastest time over a few runs, the
+# peak memory allocated while running it once (tracemalloc), and how big its output
+# is where something gets sent to the browser (equations HTML, figure JSON, hover updates).
+# It exits with 1 if anything got slower or bigger than the baseline allows (see regressions()),
+# so it can be run before a deploy. Times depend on the computer, so make your own
+# baseline (--update) on the machine you compare on.
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+# Run from anywhere: the app's modules are in the folder above this one
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core import (
+    N_CLASSES, X_AXIS, Y_AXIS, Dataset, RegionMasks, best_splits, fit_tree, split_info, table_infogain,
+)
+
+BASELINE = Path(__file__).parent / "baseline.json"
+SIZES = [10, 100, 1000, 10_000, 100_000, 1_000_000]
+# Same grid as the app (SPLIT_MIN, SPLIT_MAX, SPLIT_STEP in app.py)
+LO, HI, STEP = 0, 10, 0.5
+SPLIT = 5.0
+# Each case runs at least MIN_REPEATS times, and keeps repeating for REPEAT_SECONDS
+# (up to MAX_REPEATS) if it's fast
+MIN_REPEATS = 5
+REPEAT_SECONDS = 0.5
+MAX_REPEATS = 50
+# How much more peak memory than the baseline is allowed (0.25 = 25% more)
+MEMORY_TOLERANCE = 0.25
+
+
+def synthetic_points(n, seed=0):
+    # n datapoints, each an orange or lemon with equal chance: oranges clustered
+    # lower-left and lemons upper-right, overlapping enough that every split has some
+    # of each on both sides. The same n and seed always give the same points
+    rng = np.random.default_rng(seed)
+    label = rng.integers(0, N_CLASSES, n)
+    centre = np.where(label == 0, 3.5, 6.5)
+    x = np.clip(rng.normal(centre, 1.8), LO, HI).round(1)
+    y = np.clip(rng.normal(centre, 1.8), LO, HI).round(1)
+    return Dataset.from_points(x, y, label)
+
+
+# Each case takes the dataset and returns the size in bytes of what it would send to
+# the browser (or None), mirroring the app function named in its comment.
+# Anything the case needs that isn't part of what's being timed goes in a setup function.
+
+def case_dataset(points):
+    # Dataset.from_points, i.e. loading a file (and the SplitIndex it builds)
+    Dataset.from_points(points.x, points.y, points.label)
+
+
+def case_calculate(points):
+    # calculate(): count one split, then every number the Calculations card shows
+    split_info(points.index.count_split(X_AXIS, SPLIT))
+
+
+def case_split_curve(points):
+    # split_curve(): every slider position on both axes
+    thresholds = np.arange(LO, HI + STEP, STEP)
+    for axis in (X_AXIS, Y_AXIS):
+        for table in points.index.count_splits(axis, thresholds):
+            if table.sum(axis=1).all():
+                table_infogain(table)
+
+
+def case_best_splits(points):
+    # optimal_splits()
+    best_splits(points.x, points.y, points.label, k=3, n_classes=N_CLASSES)
+
+
+def case_tree(points):
+    # fitted_tree() with the sidebar's default settings
+    fit_tree(points.x, points.y, points.label, n_classes=N_CLASSES, max_depth=3)
+
+
+def case_hover(points, fig):
+    # Hovering a tooltip with the server doing the highlighting (add_hover_highlight),
+    # plus redrawing the points (patch_points). The size is the outline widths that
+    # get sent, the biggest part of the plot update
+    from figures import draw_points
+    masks = RegionMasks(points.x, points.label, SPLIT, N_CLASSES)
+    points.highlight[:] = masks.get(label=0, side=1)
+    draw_points(fig, points, LO, HI)
+    widths = [trace.marker.line.width for trace in fig.data if trace.visible]
+    return len(json.dumps([np.asarray(w).tolist() for w in widths]))
+
+
+def setup_hover(points):
+    from figures import draw_points, feature_figure
+    from dataset import CLASSES
+    fig = feature_figure(CLASSES, LO, HI)
+    draw_points(fig, points, LO, HI)
+    return (fig,)
+
+
+def case_mathjax(points):
+    # calculations_mathjax() rendering from scratch (its cache is cleared first)
+    from mathjax import create_mathjax_content, render_lines
+    render_lines.cache_clear()
+    info = split_info(points.index.count_split(X_AXIS, SPLIT))
+    info.update(side1="left", side2="right")
+    return len(create_mathjax_content(info, 5))
+
+
+def case_figure(points):
+    # feature_plot(): building the whole dataset plot, as first sent to the browser
+    from figures import draw_points, feature_figure
+    from dataset import CLASSES
+    fig = feature_figure(CLASSES, LO, HI)
+    draw_points(fig, points, LO, HI)
+    return len(fig.to_json())
+
+
+CASES = {
+    "dataset": (case_dataset, None),
+    "calculate": (case_calculate, None),
+    "split_curve": (case_split_curve, None),
+    "best_splits": (case_best_splits, None),
+    "tree": (case_tree, None),
+    "hover": (case_hover, setup_hover),
+    "mathjax": (case_mathjax, None),
+    "figure": (case_figure, None),
+}
+
+
+def measure(case, setup, points):
+    # (fastest time in ms, peak memory in KB, payload in bytes or None)
+    args = (points,) + (setup(points) if setup else ())
+    payload = case(*args)  # warm up (imports, caches)
+    times = []
+    start = time.perf_counter()
+    while len(times) < MIN_REPEATS or (len(times) < MAX_REPEATS and time.perf_counter() - start < REPEAT_SECONDS):
+        gc.collect()
+        t = time.perf_counter()
+        case(*args)
+        times.append(time.perf_counter() - t)
+    gc.collect()
+    tracemalloc.start()
+    case(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'ms': round(min(times) * 1000, 3), 'peak_kb': round(peak / 1024, 1), 'payload': payload}
+
+
+def regressions(result, base, tolerance):
+    # What got worse than the baseline allows, as a list of messages
+    problems = []
+    # Very short times are mostly noise, so they get some slack on top of the tolerance
+    if result['ms'] > base['ms'] * (1 + tolerance) + 0.05:
+        problems.append(f"time {base['ms']} -> {result['ms']} ms")
+    # Memory hardly varies between runs, so it gets a fixed MEMORY_TOLERANCE
+    if result['peak_kb'] > base['peak_kb'] * (1 + MEMORY_TOLERANCE) + 16:
+        problems.append(f"memory {base['peak_kb']} -> {result['peak_kb']} KB")
+    # Payloads don't depend on the computer, so any growth counts
+    if result['payload'] is not None and base.get('payload') is not None and result['payload'] > base['payload']:
+        problems.append(f"payload {base['payload']} -> {result['payload']} bytes")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the app's hot paths against a saved baseline.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="dataset sizes to run")
+    parser.add_argument("--only", nargs="+", choices=list(CASES), default=list(CASES), help="cases to run")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--update", action="store_true", help="save these results as the baseline")
+    # Timings on a busy computer easily vary by half, so by default only something
+    # twice as slow counts (the kind of slowdown that matters, like an O(n) step turning O(n^2))
+    parser.add_argument("--tolerance", type=float, default=1.0,
+                        help="how much slower than the baseline is allowed (1.0 = twice as slow)")
+    args = parser.parse_args()
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    results = {}
+    failed = []
+    print(f"{'case':<12} {'points':>9} {'ms':>10} {'peak KB':>10} {'payload':>9}  vs baseline")
+    for n in args.sizes:
+        points = synthetic_points(n)
+        for name in args.only:
+            case, setup = CASES[name]
+            key = f"{name}/{n}"
+            result = results[key] = measure(case, setup, points)
+            base = baseline.get(key)
+            if base is None:
+                note = "(no baseline)"
+            else:
+                problems = regressions(result, base, args.tolerance)
+                failed += [f"{key}: {problem}" for problem in problems]
+                note = "REGRESSED: " + ", ".join(problems) if problems else f"{result['ms'] / max(base['ms'], 1e-9):.2f}x"
+            payload = "" if result['payload'] is None else result['payload']
+            print(f"{name:<12} {n:>9} {result['ms']:>10} {result['peak_kb']:>10} {payload:>9}  {note}", flush=True)
+
+    if args.update:
+        # Keep the baseline for anything that wasn't run this time
+        baseline.update(results)
+        args.baseline.write_text(json.dumps(baseline, indent=1, sort_keys=True) + "\n")
+        print(f"Saved {len(results)} results to {args.baseline}")
+        return 0
+    if failed:
+        print(f"\n{len(failed)} regression(s):")
+        print("\n".join(failed))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+# The maths behind the app (entropy, information gain, split counting, decision trees,
+# the dataset and loading/saving it) in one place, without Shiny, Plotly or shinywidgets,
+# for scripts, notebooks and benchmarks:
+#     from core import Dataset, best_splits, split_info
+# Nothing is imported until it's first used, so "import core" itself takes no time,
+# and using it only ever loads numpy and the modules below (all in the repo's top level).
+import importlib
+
+# Name -> module it lives in
+_EXPORTS = {
+    # entropy.py
+    "calculate_entropy": "entropy",
+    "calculate_condent": "entropy",
+    "calculate_infogain": "entropy",
+    "table_infogain": "entropy",
+    "split_info": "entropy",
+    "entropies": "entropy",
+    "infogains": "entropy",
+    # splits.py
+    "X_AXIS": "splits",
+    "Y_AXIS": "splits",
+    "count_split": "splits",
+    "count_splits": "splits",
+    "SplitIndex": "splits",
+    "candidate_splits": "splits",
+    "best_splits": "splits",
+    # tree.py
+    "LEAF": "tree",
+    "DecisionTree": "tree",
+    "fit_tree": "tree",
+    # dataset.py
+    "CLASSES": "dataset",
+    "N_CLASSES": "dataset",
+    "LABELS": "dataset",
+    "Dataset": "dataset",
+    "random_points": "dataset",
+    # dataio.py
+    "read_points": "dataio",
+    "write_points": "dataio",
+    "file_format": "dataio",
+    # highlight.py
+    "RegionMasks": "highlight",
+    "hover_targets": "highlight",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    # Keep it, so this is only called once per name
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return __all__
@@ -0,0 +1,192 @@
+import csv
+import io
+import json
+from importlib.util import find_spec
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+
+from dataset import CLASSES
+
+# Loading and saving whole datasets as CSV, JSON or Parquet files.
+# Every format has the same three columns: x, y and label, where label is
+# the class name (e.g. Orange) or its label number (e.g. 0).
+# JSON files are columnar, i.e. {"x": [...], "y": [...], "label": [...]}.
+# CSV and Parquet files are read a chunk of rows at a time straight into numpy
+# arrays, and each chunk is checked (and clipped) all at once, so even a huge file
+# never becomes a Python object per row, and reading stops as soon as there are
+# enough points. JSON files are the exception: the standard json module can only
+# read a whole file at once, so they're loaded whole (as Python lists) first.
+
+COLUMNS = ("x", "y", "label")
+FORMATS = ("csv", "json", "parquet")
+# Parquet needs pyarrow, which isn't in Requirements.txt, so it's only offered when it's installed
+AVAILABLE_FORMATS = tuple(fmt for fmt in FORMATS if fmt != "parquet" or find_spec("pyarrow") is not None)
+# Rows parsed at a time
+CHUNK_ROWS = 65536
+
+
+def file_format(name):
+    # Format of a file from its name, e.g. points.csv -> csv
+    fmt = Path(name).suffix.lower().lstrip(".")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown file type .{fmt} (use {', '.join('.' + f for f in FORMATS)})")
+    return fmt
+
+
+def parse_labels(values):
+    # Label numbers for a column of class names or label numbers, -1 for anything else
+    values = np.asarray(values)
+    if values.dtype.kind in "iuf":
+        # A numeric column (e.g. JSON numbers, or a Parquet column of doubles):
+        # whole numbers that are a class's label, whatever type they're stored as
+        numbers = values.astype(np.float64)
+        valid = (numbers == np.round(numbers)) & (numbers >= 0) & (numbers < len(CLASSES))
+        return np.where(valid, numbers, -1).astype(np.int64)
+    # Only the distinct values are looked at, so this is fast however long the column is
+    names, inverse = np.unique(values.astype(str), return_inverse=True)
+    lookup = np.full(len(names), -1, dtype=np.int64)
+    for i, name in enumerate(np.char.lower(np.char.strip(names, " \"'"))):
+        for label, cls in enumerate(CLASSES):
+            if name == cls['name'].lower() or _label_number(name) == label:
+                lookup[i] = label
+    return lookup[inverse.reshape(-1)]
+
+
+def _label_number(text):
+    # The label number written in text (e.g. "1" or "1.0"), or None
+    try:
+        number = float(text)
+    except ValueError:
+        return None
+    return int(number) if number.is_integer() else None
+
+
+def clean(x, y, label, lo, hi, clip=True):
+    # Leave out rows with a missing coordinate or unknown label, and either move
+    # coordinates outside [lo, hi] onto the nearest edge (clip) or leave them out too
+    # Returns the rows that are kept, and how many were left out
+    keep = np.isfinite(x) & np.isfinite(y) & (label >= 0)
+    if clip:
+        x = np.clip(x, lo, hi)
+        y = np.clip(y, lo, hi)
+    else:
+        keep &= (x >= lo) & (x <= hi) & (y >= lo) & (y <= hi)
+    return x[keep], y[keep], label[keep], len(keep) - int(np.count_nonzero(keep))
+
+
+# Each reader yields (x, y, raw labels) chunks of at most chunk_rows rows
+
+def _csv_chunks(path, chunk_rows):
+    with open(path, newline="") as f:
+        header = [name.strip(" \"'\r\n").lower() for name in f.readline().split(",")]
+        missing = [name for name in COLUMNS if name not in header]
+        if missing:
+            raise ValueError(f"Missing column(s): {', '.join(missing)} (the first line should be x,y,label)")
+        xy_cols = (header.index("x"), header.index("y"))
+        label_col = header.index("label")
+        while True:
+            lines = list(islice(f, chunk_rows))
+            if not lines:
+                return
+            # Fields can be quoted (e.g. "1.5"), as spreadsheets often save them
+            try:
+                xy = np.loadtxt(lines, delimiter=",", quotechar='"', usecols=xy_cols, dtype=np.float64, ndmin=2)
+            except ValueError:
+                # Some numbers can't be read, so parse the chunk again (more slowly, a row
+                # at a time) with those as nan, and they get left out by clean()
+                rows = [row for row in csv.reader(lines, skipinitialspace=True) if row]
+                xy = np.array([[_number(row, col) for col in xy_cols] for row in rows], dtype=np.float64).reshape(-1, 2)
+            labels = np.loadtxt(lines, delimiter=",", quotechar='"', usecols=label_col, dtype=str, ndmin=1)
+            yield xy[:, 0], xy[:, 1], labels
+
+
+def _number(row, col):
+    # row[col] of a csv row as a number, or nan if it's missing or isn't one
+    try:
+        return float(row[col])
+    except (IndexError, ValueError):
+        return np.nan
+
+
+def _json_chunks(path, chunk_rows):
+    # (the whole file is loaded first, see the top of this file)
+    with open(path) as f:
+        data = json.load(f)
+    if not isinstance(data, dict) or any(name not in data for name in COLUMNS):
+        raise ValueError('JSON files should look like {"x": [...], "y": [...], "label": [...]}')
+    # null coordinates become nan, and get left out by clean()
+    x = np.asarray(data["x"], dtype=np.float64)
+    y = np.asarray(data["y"], dtype=np.float64)
+    labels = np.asarray(data["label"])
+    if not len(x) == len(y) == len(labels):
+        raise ValueError("The x, y and label lists should all be the same length")
+    for start in range(0, len(x), chunk_rows):
+        end = start + chunk_rows
+        yield x[start:end], y[start:end], labels[start:end]
+
+
+def _parquet_chunks(path, chunk_rows):
+    # pyarrow is only needed for Parquet files, so it's only imported for them
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet files need pyarrow (pip install pyarrow)") from None
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=list(COLUMNS)):
+        yield (
+            batch.column("x").to_numpy(zero_copy_only=False).astype(np.float64),
+            batch.column("y").to_numpy(zero_copy_only=False).astype(np.float64),
+            batch.column("label").to_numpy(zero_copy_only=False),
+        )
+
+
+READERS = {"csv": _csv_chunks, "json": _json_chunks, "parquet": _parquet_chunks}
+
+
+def read_points(path, fmt, lo, hi, clip=True, limit=None, chunk_rows=CHUNK_ROWS):
+    # Every usable point in a file, as (x, y, label, report) where report counts
+    # the rows read, the rows left out by clean(), and whether the file had more
+    # than limit usable points (in which case only the first limit are kept)
+    xs, ys, labels = [], [], []
+    report = {'read': 0, 'dropped': 0, 'truncated': False}
+    kept = 0
+    for x, y, raw in READERS[fmt](path, chunk_rows):
+        report['read'] += len(x)
+        x, y, label, dropped = clean(x, y, parse_labels(raw), lo, hi, clip)
+        report['dropped'] += dropped
+        if limit is not None and kept + len(x) > limit:
+            x, y, label = x[:limit - kept], y[:limit - kept], label[:limit - kept]
+            report['truncated'] = True
+        xs.append(x)
+        ys.append(y)
+        labels.append(label)
+        kept += len(x)
+        if report['truncated']:
+            break
+    if not xs:
+        return np.empty(0), np.empty(0), np.empty(0, dtype=np.int64), report
+    return np.concatenate(xs), np.concatenate(ys), np.concatenate(labels), report
+
+
+def write_points(points, fmt):
+    # A dataset as the contents of a file (str for CSV/JSON, bytes for Parquet),
+    # with class names as the labels
+    names = np.array([cls['name'] for cls in CLASSES])[points.label]
+    if fmt == "csv":
+        out = io.StringIO()
+        rows = np.column_stack((points.x.astype(str), points.y.astype(str), names))
+        np.savetxt(out, rows, fmt="%s", delimiter=",", header=",".join(COLUMNS), comments="")
+        return out.getvalue()
+    if fmt == "json":
+        return json.dumps({"x": points.x.tolist(), "y": points.y.tolist(), "label": names.tolist()})
+    if fmt == "parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet files need pyarrow (pip install pyarrow)") from None
+        out = io.BytesIO()
+        pq.write_table(pa.table({"x": points.x, "y": points.y, "label": names}), out)
+        return out.getvalue()
+    raise ValueError(f"Unknown file type .{fmt}")
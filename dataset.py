@@ -0,0 +1,156 @@
+import numpy as np
+
+from splits import SplitIndex
+
+# Every kind of datapoint, in label order (a point with label i is a CLASSES[i])
+# Adding a class here is enough for the select boxes, plot traces, counts,
+# entropy and highlighting to pick it up, since they all loop over this list
+CLASSES = [
+    {"name": "Orange", "plural": "Oranges", "color": "#FF7400", "symbol": "circle"},
+    {"name": "Lemon", "plural": "Lemons", "color": "#5B1EE5", "symbol": "triangle-up"},
+]
+N_CLASSES = len(CLASSES)
+
+# Label values stored in Dataset.label
+ORANGE = 0
+LEMON = 1
+LABELS = {cls["name"]: label for label, cls in enumerate(CLASSES)}
+
+
+class Dataset:
+    """
+    All datapoints stored column by column in numpy arrays (x, y, label, highlight).
+    The arrays have spare room at the end that doubles whenever it runs out,
+    so adding a point is amortised O(1) and never copies the whole dataset.
+    Use the x, y, label and highlight properties to get (writable) views of
+    just the points that are actually in the dataset.
+    The points are also kept in a SplitIndex (see splits.py), which is updated
+    on every append/pop so splits can be counted with a binary search.
+    Change the points through append/pop (or extend/remove for many at once),
+    not the x/y/label views, so the index stays in sync.
+    """
+
+    def __init__(self, capacity=16):
+        self._x = np.empty(capacity, dtype=np.float64)
+        self._y = np.empty(capacity, dtype=np.float64)
+        self._label = np.empty(capacity, dtype=np.int8)
+        self._highlight = np.zeros(capacity, dtype=bool)
+        self.size = 0
+        self.index = SplitIndex(n_classes=N_CLASSES)
+
+    @classmethod
+    def from_points(cls, x, y, label):
+        x = np.asarray(x, dtype=np.float64)
+        data = cls(capacity=max(16, 2 * len(x)))
+        data.size = len(x)
+        data.x[:] = x
+        data.y[:] = y
+        data.label[:] = label
+        data.index = SplitIndex.from_points(data.x, data.y, data.label, n_classes=N_CLASSES)
+        return data
+
+    def copy(self):
+        data = Dataset.from_points(self.x, self.y, self.label)
+        data.highlight[:] = self.highlight
+        return data
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def x(self):
+        return self._x[:self.size]
+
+    @property
+    def y(self):
+        return self._y[:self.size]
+
+    @property
+    def label(self):
+        return self._label[:self.size]
+
+    @property
+    def highlight(self):
+        return self._highlight[:self.size]
+
+    def count(self, label):
+        return self.index.count(label)
+
+    def _reserve(self, needed):
+        capacity = len(self._x)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in ("_x", "_y", "_label", "_highlight"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def append(self, x, y, label):
+        self._reserve(self.size + 1)
+        i = self.size
+        self._x[i] = x
+        self._y[i] = y
+        self._label[i] = label
+        self._highlight[i] = False
+        self.size += 1
+        self.index.insert(x, y, label)
+
+    def pop(self, label):
+        # Remove the most recently added point with this label
+        # Returns False if there weren't any points with that label
+        idx = np.flatnonzero(self.label == label)
+        if len(idx) == 0:
+            return False
+        i = idx[-1]
+        self.index.remove(self._x[i], self._y[i], label)
+        # Shift everything after it back by one (a single memmove per column)
+        for arr in (self._x, self._y, self._label, self._highlight):
+            arr[i:self.size - 1] = arr[i + 1:self.size]
+        self.size -= 1
+        return True
+
+    def extend(self, x, y, label):
+        # Add many points at once, with one copy per column and one merge into the index
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        label = np.asarray(label, dtype=np.int64)
+        start, end = self.size, self.size + len(x)
+        self._reserve(end)
+        self._x[start:end] = x
+        self._y[start:end] = y
+        self._label[start:end] = label
+        self._highlight[start:end] = False
+        self.size = end
+        self.index.insert_many(x, y, label)
+
+    def remove(self, mask):
+        # Remove every point where mask is True (the rest stay in order)
+        # Returns how many were removed
+        keep = ~np.asarray(mask, dtype=bool)
+        kept = int(np.count_nonzero(keep))
+        removed = self.size - kept
+        if removed == 0:
+            return 0
+        for arr in (self._x, self._y, self._label, self._highlight):
+            arr[:kept] = arr[:self.size][keep]
+        self.size = kept
+        self.index = SplitIndex.from_points(self.x, self.y, self.label, n_classes=self.index.n_classes)
+        return removed
+
+    def clear(self):
+        return self.remove(np.ones(self.size, dtype=bool))
+
+    def in_region(self, x0, x1, y0, y1):
+        # Mask of the points inside a rectangle (edges included), e.g. for remove()
+        return (self.x >= x0) & (self.x <= x1) & (self.y >= y0) & (self.y <= y1)
+
+
+def random_points(n, lo, hi, rng):
+    # n points spread uniformly over the grid (to one decimal place), with random classes
+    x = rng.uniform(lo, hi, n).round(1)
+    y = rng.uniform(lo, hi, n).round(1)
+    label = rng.integers(0, N_CLASSES, n)
+    return x, y, label
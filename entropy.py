@@ -0,0 +1,94 @@
+from functools import lru_cache
+
+import numpy as np
+
+# Entropy only ever needs n * log2(n) for whole-number counts n, so instead of
+# taking logs of ratios every time, keep a table of n * log2(n) for
+# n = 0, 1, 2, ... (with 0 * log2(0) = 0) that grows to the largest count seen.
+# Then H = (t log2 t - n1 log2 n1 - n2 log2 n2 - ...) / t is one lookup per class.
+_nlogn_table = np.zeros(1)
+
+def nlogn(counts):
+    # n * log2(n) for an integer count or array of counts
+    global _nlogn_table
+    largest = int(np.max(counts, initial=0))
+    if largest >= len(_nlogn_table):
+        n = np.arange(max(largest + 1, 2 * len(_nlogn_table)), dtype=np.float64)
+        table = np.zeros(len(n))
+        table[1:] = n[1:] * np.log2(n[1:])
+        _nlogn_table = table
+    return _nlogn_table[counts]
+
+
+# Calculation helper functions
+# calculate_entropy gets called with the same counts over and over (every split
+# on the same dataset shares its H(Y), sides often repeat...), so it's memoised
+# on the integer counts
+# Takes one count per class, e.g. calculate_entropy(oranges, lemons)
+@lru_cache(maxsize=4096)
+def calculate_entropy(*counts):
+    t = sum(counts)
+    h = float(nlogn(t))
+    for n_log_n in nlogn(np.array(counts)).tolist():
+        h -= n_log_n
+    h /= t
+    return 0.0 if round(h, 2) == 0.0 else round(h, 2)
+
+def calculate_condent(n1, n2, t, e1, e2):
+    p1 = n1/t
+    p2 = n2/t
+    return round(p1 * e1 + p2 * e2, 2)
+
+def calculate_infogain(e1, e2):
+    return round(e1-e2, 2)
+
+# Same rounded information gain that calculate() shows, for a split table from splits.py
+def table_infogain(table):
+    side1, side2 = table.tolist()
+    side1s = sum(side1)
+    side2s = sum(side2)
+    total = side1s + side2s
+    h_y = calculate_entropy(*(n1 + n2 for n1, n2 in zip(side1, side2)))
+    h_yside1 = calculate_entropy(*side1)
+    h_yside2 = calculate_entropy(*side2)
+    h_yx = calculate_condent(side1s, side2s, total, h_yside1, h_yside2)
+    return calculate_infogain(h_y, h_yx)
+
+# Every number the Calculations card shows for a split table from splits.py,
+# with counts per class in the same order as CLASSES (see calculate() in app.py)
+# valid is 0 (and nothing else is filled in) if one side of the split is empty
+def split_info(table):
+    side1_counts, side2_counts = table.tolist()
+    counts = [n1 + n2 for n1, n2 in zip(side1_counts, side2_counts)]
+    total = sum(counts)
+    side1s = sum(side1_counts)
+    side2s = sum(side2_counts)
+    if side1s == 0 or side2s == 0:
+        return {'valid': 0}
+    h_y = calculate_entropy(*counts)
+    h_yside1 = calculate_entropy(*side1_counts)
+    h_yside2 = calculate_entropy(*side2_counts)
+    h_yx = calculate_condent(side1s, side2s, total, h_yside1, h_yside2)
+    infogain = calculate_infogain(h_y, h_yx)
+    return {'valid': 1,
+            'side1_counts': side1_counts, 'side2_counts': side2_counts,
+            'counts': counts, 'total': total,
+            'side1s': side1s, 'side2s': side2s, 'h_y': h_y,
+            'h_yside1': h_yside1, 'h_yside2': h_yside2, 'h_yx': h_yx,
+            'infogain': infogain}
+
+# Vectorised versions for scoring lots of splits at once (not rounded)
+# counts is an integer array with the class counts along its last axis
+def entropies(counts):
+    totals = counts.sum(axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        h = (nlogn(totals) - nlogn(counts).sum(axis=-1)) / totals
+    return np.where(totals > 0, h, 0.0)
+
+# tables has shape (..., 2, n_classes), like the ones from splits.count_splits
+def infogains(tables):
+    side_totals = tables.sum(axis=-1)
+    totals = side_totals.sum(axis=-1)
+    h_y = entropies(tables.sum(axis=-2))
+    h_yx = (side_totals * entropies(tables)).sum(axis=-1) / totals
+    return h_y - h_yx
@@ -0,0 +1,182 @@
+import numpy as np
+import plotly.graph_objects as go
+
+from dataset import N_CLASSES
+from splits import X_AXIS
+
+# The dataset plot is built once per session (feature_figure) and then only
+# patched in place, so everything below keeps each trace and shape at a fixed
+# position that the patching code can find again.
+# Traces: one per class, then one more per class drawn with WebGL (only one of each
+# class's two is shown at a time)
+
+def class_trace(label, webgl=False):
+    return label + (N_CLASSES if webgl else 0)
+
+# Ways of drawing the datapoints, from fewest to most points (see point_mode)
+SVG = "svg"          # every point as its own SVG marker
+WEBGL = "webgl"      # every point, drawn with WebGL, which keeps up with far more markers
+BINNED = "binned"    # one marker per grid cell with any points in it, sized by how many
+
+POINT_SIZE = 12
+# Past WEBGL_POINTS datapoints they're drawn with WebGL, and past BINNED_POINTS as one
+# marker per cell of a POINT_BINS x POINT_BINS grid instead of one per point, so what's
+# sent to the browser stops growing with the number of points. Keep SPLIT_STEP in app.py
+# a multiple of the cell width, so no cell is ever on both sides of the split
+WEBGL_POINTS = 2000
+BINNED_POINTS = 5000
+POINT_BINS = 40
+
+# Shapes: the hover highlight rectangle, the user's split, the best split, then
+# the decision tree's regions (one rectangle per leaf, as many as the tree has)
+RECT_SHAPE = 0
+SPLIT_SHAPE = 1
+BEST_SHAPE = 2
+REGION_SHAPES = 3
+# The best split's label
+BEST_ANNOTATION = 0
+
+
+def split_line(axis, loc):
+    # Shape coordinates for a line across the whole plot at loc
+    # (a vertical line for a split on the x axis, horizontal for the y axis)
+    if axis == X_AXIS:
+        return dict(x0=loc, x1=loc, xref="x", y0=0, y1=1, yref="y domain")
+    return dict(x0=0, x1=1, xref="x domain", y0=loc, y1=loc, yref="y")
+
+
+def split_label(axis, loc):
+    # Annotation position for a label at the end of split_line(axis, loc)
+    if axis == X_AXIS:
+        return dict(x=loc, xref="x", xanchor="left", y=1, yref="y domain", yanchor="top")
+    return dict(x=1, xref="x domain", xanchor="right", y=loc, yref="y", yanchor="bottom")
+
+
+def region_shapes(boxes, classes):
+    # A rectangle shaded in its class's colour for each of DecisionTree.leaf_boxes,
+    # drawn under the grid and the points
+    return [
+        dict(
+            type="rect", x0=x0, x1=x1, y0=y0, y1=y1, layer="below",
+            fillcolor=classes[label]['color'], opacity=0.15, line_width=0,
+        )
+        for x0, x1, y0, y1, label in boxes
+    ]
+
+
+def point_mode(n, webgl_points=WEBGL_POINTS, binned_points=BINNED_POINTS):
+    # How to draw n datapoints
+    if n > binned_points:
+        return BINNED
+    if n > webgl_points:
+        return WEBGL
+    return SVG
+
+
+def bin_points(x, y, highlight, lo, hi, bins=POINT_BINS):
+    # Count one class's points in a bins x bins grid over [lo, hi], for BINNED mode
+    # Returns the centre of every cell with any points in it, whether any of its
+    # points are highlighted, and how many points it has
+    # As long as each cell is no wider than the slider step (and lines up with it),
+    # every cell is entirely on one side of any split the slider can make
+    cell = (hi - lo) / bins
+    col = np.clip(((x - lo) / cell).astype(np.int64), 0, bins - 1)
+    row = np.clip(((y - lo) / cell).astype(np.int64), 0, bins - 1)
+    flat = row * bins + col
+    counts = np.bincount(flat, minlength=bins * bins)
+    lit = np.bincount(flat, weights=highlight, minlength=bins * bins) > 0
+    occupied = np.flatnonzero(counts)
+    centre_x = lo + (occupied % bins + 0.5) * cell
+    centre_y = lo + (occupied // bins + 0.5) * cell
+    return centre_x, centre_y, lit[occupied], counts[occupied]
+
+
+def binned_sizes(counts):
+    # Marker sizes for binned cells, with area growing with the count up to POINT_SIZE * 1.5
+    return 4 + (POINT_SIZE * 1.5 - 4) * np.sqrt(counts / counts.max()) if len(counts) else POINT_SIZE
+
+
+def class_markers(points, label, mode, lo, hi):
+    # The markers draw_points makes for one class: their x, y, whether each is
+    # highlighted, and how many points each stands for (None unless binned)
+    is_label = points.label == label
+    x, y, lit = points.x[is_label], points.y[is_label], points.highlight[is_label]
+    if mode != BINNED:
+        return x, y, lit, None
+    return bin_points(x, y, lit, lo, hi)
+
+
+def draw_points(fig, points, lo, hi):
+    # Fill in the class traces from a Dataset, in whichever mode suits its size
+    mode = point_mode(len(points))
+    # Plotly skips any value that hasn't changed, so e.g. hovering over
+    # one class's term only sends that class's outline widths
+    with fig.batch_update():
+        for label in range(N_CLASSES):
+            x, y, lit, counts = class_markers(points, label, mode, lo, hi)
+            trace = fig.data[class_trace(label, webgl=mode != SVG)]
+            trace.update(x=x, y=y, text=counts, visible=True)
+            trace.marker.size = POINT_SIZE if counts is None else binned_sizes(counts)
+            # Outline width is 2 for highlighted points and 0 (no outline) for the rest
+            trace.marker.line.width = np.where(lit, 2, 0)
+            # Empty and hide the class's other trace
+            fig.data[class_trace(label, webgl=mode == SVG)].update(x=[], y=[], visible=False)
+
+
+def feature_figure(classes, lo, hi):
+    # The dataset plot with every trace and shape it will ever need (apart from the
+    # decision regions, which are added as the tree changes), all empty/hidden
+    fig = go.Figure()
+    for scatter in (go.Scatter, go.Scattergl):
+        for cls in classes:
+            fig.add_trace(scatter(
+                x=[],
+                y=[],
+                mode='markers',
+                name=cls['name'],
+                marker=dict(
+                    color=cls['color'],
+                    size=POINT_SIZE,
+                    symbol=cls['symbol'],
+                    line=dict(
+                        color='black',
+                        width=0  # 0 width removes outline for some points
+                    )
+                ),
+                visible=scatter is go.Scatter
+            ))
+    # Make plot
+    fig.update_layout(
+        xaxis=dict(
+            range=[lo, hi],
+            fixedrange=True,  # Locks zooming
+            dtick=1,
+            showgrid=True,
+            gridcolor='rgba(0, 0, 0, 0.1)',
+            gridwidth=1
+        ),
+        yaxis=dict(
+            range=[lo, hi],
+            fixedrange=True,  # Locks zooming
+            dtick=1,
+            showgrid=True,
+            gridcolor='rgba(0, 0, 0, 0.1)',
+            gridwidth=1
+        ),
+        xaxis_title="Width (cm)",
+        yaxis_title="Height (cm)",
+        showlegend=True,
+        plot_bgcolor='white',
+        dragmode=False,  # Disables all drag interactions
+        modebar=dict(
+            remove=["select2d", "lasso2d"]
+        )
+    )
+    # Highlights from tooltip
+    fig.add_shape(type="rect", x0=0, x1=0, y0=0, y1=0, fillcolor="yellow", opacity=0.2)
+    # Split location
+    fig.add_shape(type="line", line=dict(color="blue", width=2, dash="dash"), **split_line(X_AXIS, lo))
+    # Best split
+    fig.add_shape(type="line", line=dict(color="green", width=2, dash="dot"), visible=False, **split_line(X_AXIS, lo))
+    fig.add_annotation(text="", showarrow=False, visible=False, **split_label(X_AXIS, lo))
+    return fig
@@ -0,0 +1,55 @@
+import numpy as np
+
+# Which datapoints (and which part of the plot) each tooltip in the equations highlights.
+# Sides are numbered like splits.py: side 0 is strictly below the split
+# (left/below), side 1 is everything else (right/above).
+
+
+class RegionMasks:
+    """
+    Every group of points a tooltip can highlight, for one dataset and split,
+    worked out together in one vectorised pass.
+    masks[label, side] is a boolean mask over the points, where label can also
+    be n_classes (every class) and side can also be 2 (both sides), so looking
+    one up when a tooltip is hovered is just indexing.
+    """
+
+    def __init__(self, values, labels, split_loc, n_classes):
+        self.n_classes = n_classes
+        # values are the coordinates along the split axis (points.x or points.y)
+        self.side = values >= split_loc
+        is_class = np.ones((n_classes + 1, len(labels)), dtype=bool)
+        is_class[:n_classes] = labels == np.arange(n_classes)[:, np.newaxis]
+        on_side = np.stack([~self.side, self.side, np.ones(len(labels), dtype=bool)])
+        self.masks = is_class[:, np.newaxis, :] & on_side[np.newaxis, :, :]
+
+    def get(self, label=None, side=None):
+        # label/side of None means every class/both sides
+        return self.masks[self.n_classes if label is None else label, 2 if side is None else side]
+
+
+def side_rect(side, vertical, split_loc, lo, hi):
+    # Rectangle [x0, x1, y0, y1] covering one side of the split
+    if vertical:
+        return [lo, split_loc, hi, lo] if side == 0 else [hi, split_loc, hi, lo]
+    return [lo, hi, split_loc, lo] if side == 0 else [lo, hi, split_loc, hi]
+
+
+def hover_targets(class_keys, vertical, split_loc, lo, hi):
+    # What hovering each tooltip highlights, by its input id:
+    #   label   the class whose points get outlined (None for every class)
+    #   side    the side of the split they're on (None for both sides)
+    #   points  whether any points get outlined at all
+    #   rect    the rectangle to shade
+    # class_keys are the class names used in input ids (e.g. btn_all_oranges), in label order
+    whole_plot = [lo, hi, hi, lo]
+    targets = {}
+    for side in (0, 1):
+        n = side + 1
+        targets[f"btn_side{n}"] = {'label': None, 'side': side, 'points': True, 'rect': whole_plot}
+        targets[f"btn_X_side{n}"] = {'label': None, 'side': side, 'points': False, 'rect': side_rect(side, vertical, split_loc, lo, hi)}
+    for label, key in enumerate(class_keys):
+        targets[f"btn_all_{key}"] = {'label': label, 'side': None, 'points': True, 'rect': whole_plot}
+        for side in (0, 1):
+            targets[f"btn_{key}_side{side + 1}"] = {'label': label, 'side': side, 'points': True, 'rect': side_rect(side, vertical, split_loc, lo, hi)}
+    return targets
@@ -0,0 +1,404 @@
+# Simulates a class full of students using the app at once, over the same websocket
+# protocol the browser uses, and reports how long updates take and what it costs the server:
+#     python loadtest/loadtest.py --sessions 30 --duration 60
+#     python loadtest/loadtest.py --url http://127.0.0.1:8000 --pid 12345 --sessions 100
+# Without --url it starts its own server (shiny run app.py) on a free port and stops it after.
+# Each simulated session loads the page, connects, and then keeps picking one of the
+# SCENARIOS (dragging the split slider, adding datapoints, hovering over the tooltips,
+# ...) with a pause to think in between. Every input it sends is timed from sending it
+# to the last message of the server's reply (see Session.send), and the report gives
+# the 50th/95th/99th percentile of those for each kind of action.
+# While it runs, the server's CPU use and memory (its process and any it started,
+# read from /proc, so Linux only) are sampled to work out the cost per session.
+# Needs websockets (pip install -r Requirements-dev.txt).
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+import websockets
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from core import CLASSES, LABELS, hover_targets
+from mathjax import class_key
+
+# The inputs' starting values, as the browser would send them when it connects
+# (same as the ui.input_* calls in app.py, so update this if those change)
+INITIAL_INPUTS = {
+    "vertical": True, "split_loc": 3, "show_best": False,
+    "xcoord": 1, "ycoord": 1, "select_add": list(LABELS)[0],
+    "add_dp:shiny.action": 0, "select_remove": list(LABELS)[0], "remove_dp:shiny.action": 0,
+    "n_random": 10, "add_random:shiny.action": 0, "select_side": "0",
+    "remove_side:shiny.action": 0, "clear_points:shiny.action": 0,
+    "clip_upload": True, "download_format": "csv",
+    "show_tree": False, "max_depth": 3, "min_samples_leaf": 1, "min_gain": 0,
+    "notation:shiny.action": 0, "variables:shiny.action": 0, "definition:shiny.action": 0,
+}
+OUTPUTS = (
+    "feature_plot", "ig_curve", "calculations_mathjax", "show_toggling", "error_check",
+    "best_split_list", "tree_rules", "debug_panel",
+)
+# Every tooltip's input id (btn_side1, btn_oranges_side2, ...)
+HOVER_INPUTS = list(hover_targets([class_key(cls) for cls in CLASSES], True, 0, 0, 10))
+
+# How long to wait for more messages before deciding the server's reply is complete
+QUIET = 0.1
+# Longest a reply can take before it's counted as timed out
+TIMEOUT = 30
+# Seconds between slider values while dragging (the browser sends the slider's value
+# at most every 250ms), and between mouse moves in a hover storm
+DRAG_INTERVAL = 0.3
+HOVER_INTERVAL = 0.05
+
+
+class Session:
+    """
+    One simulated browser tab: a websocket connection to the app, plus the messages
+    the server has sent it that haven't been read yet.
+    """
+
+    def __init__(self, url, results):
+        self.url = url.rstrip("/")
+        self.results = results
+        self.ws = None
+        self.messages = asyncio.Queue()
+        self.actions = defaultdict(int)  # action button -> times clicked
+        self.reader = None
+
+    async def connect(self):
+        # Load the page first like a browser would (which also gets any cookie a
+        # dispatcher in front of the workers uses to send this session to the same one)
+        start = time.perf_counter()
+        cookie = await asyncio.to_thread(self._load_page)
+        self.results.latency("page", time.perf_counter() - start)
+        ws_url = "ws" + self.url[len("http"):] + "/websocket/"
+        headers = {"Cookie": cookie} if cookie else None
+        self.ws = await websockets.connect(ws_url, max_size=None, additional_headers=headers)
+        self.reader = asyncio.create_task(self._read())
+        host, _, port = self.url.split("//")[1].partition(":")
+        data = dict(INITIAL_INPUTS)
+        data.update({
+            ".clientdata_url_protocol": "http:", ".clientdata_url_hostname": host,
+            ".clientdata_url_port": port, ".clientdata_url_pathname": "/",
+            ".clientdata_url_search": "", ".clientdata_url_hash_initial": "",
+            ".clientdata_url_hash": "", ".clientdata_pixelratio": 1,
+            ".clientdata_allowDataUriScheme": True,
+        })
+        data.update({f".clientdata_output_{output}_hidden": False for output in OUTPUTS})
+        await self.send("startup", {"method": "init", "data": data})
+
+    def _load_page(self):
+        with urllib.request.urlopen(self.url + "/", timeout=TIMEOUT) as response:
+            response.read()
+            cookies = response.headers.get_all("Set-Cookie") or []
+        return "; ".join(cookie.split(";")[0] for cookie in cookies)
+
+    async def _read(self):
+        try:
+            async for message in self.ws:
+                await self.messages.put((time.perf_counter(), message))
+        except websockets.ConnectionClosed:
+            pass
+        await self.messages.put((time.perf_counter(), None))
+
+    async def send(self, kind, message):
+        # Send a message and time the server's reply. Every input change gets a
+        # "values" message at the end of the server's flush (even if nothing changed),
+        # and the plot's updates follow straight after it, so the reply is done
+        # once that's arrived and nothing else comes for QUIET seconds.
+        # Anything left over from before (e.g. a debounced input firing late) isn't part of this reply
+        while not self.messages.empty():
+            _, text = self.messages.get_nowait()
+            if text is None:
+                raise ConnectionError("the server closed the connection")
+            self.results.received(len(text))
+        start = time.perf_counter()
+        await self.ws.send(json.dumps(message))
+        deadline = start + TIMEOUT
+        end = None
+        while True:
+            wait = QUIET if end is not None else deadline - time.perf_counter()
+            try:
+                arrived, text = await asyncio.wait_for(self.messages.get(), max(wait, 0))
+            except asyncio.TimeoutError:
+                break
+            if text is None:
+                raise ConnectionError("the server closed the connection")
+            if end is not None:
+                end = arrived
+            elif text.startswith('{"values"'):
+                end = arrived
+            self.results.received(len(text))
+        if end is None:
+            self.results.error(f"{kind}: no reply within {TIMEOUT}s")
+            return
+        self.results.latency(kind, end - start)
+
+    async def update(self, kind, values):
+        await self.send(kind, {"method": "update", "data": values})
+
+    async def click(self, kind, button):
+        self.actions[button] += 1
+        await self.update(kind, {f"{button}:shiny.action": self.actions[button]})
+
+    async def close(self):
+        await self.ws.close()
+        await self.reader
+
+
+# Each scenario is one thing a student does, as a few inputs sent in a row
+
+async def drag_split(session, rng):
+    # Drag the split slider a few steps one way, sometimes flipping the direction first
+    if rng.random() < 0.2:
+        await session.update("split_direction", {"vertical": bool(rng.random() < 0.5)})
+    location = float(rng.choice(np.arange(0, 10.5, 0.5)))
+    direction = rng.choice((-0.5, 0.5))
+    for _ in range(rng.randint(3, 8)):
+        location = min(10, max(0, location + direction))
+        await session.update("drag_split", {"split_loc": location})
+        await asyncio.sleep(DRAG_INTERVAL)
+
+
+async def add_point(session, rng):
+    # Type in a datapoint's coordinates, pick its class and add it
+    await session.update("type_coords", {
+        "xcoord": round(rng.uniform(0, 10), 1),
+        "ycoord": round(rng.uniform(0, 10), 1),
+        "select_add": rng.choice(list(LABELS)),
+    })
+    await session.click("add_point", "add_dp")
+
+
+async def hover_storm(session, rng):
+    # Move the mouse back and forth over the equations' tooltips
+    # (the app only sends these to the server when it's not highlighting in the
+    # browser, see CLIENT_HOVER in app.py, so this is the worst case)
+    for _ in range(rng.randint(5, 20)):
+        input_id = rng.choice(HOVER_INPUTS)
+        await session.update("hover", {input_id: "Hovered"})
+        await asyncio.sleep(HOVER_INTERVAL)
+        await session.update("hover", {input_id: "Not Hovered"})
+        await asyncio.sleep(HOVER_INTERVAL)
+
+
+async def toggle(session, rng):
+    # One of the notation/variables/definition buttons, or a step through the calculations
+    await session.click("toggle", rng.choice(("notation", "variables", "definition")))
+
+
+async def grow_tree(session, rng):
+    # Show the full tree at some depth
+    await session.update("grow_tree", {"show_tree": True, "max_depth": rng.randint(1, 5)})
+
+
+# How often each is picked (roughly what a student does in a lecture)
+SCENARIOS = {
+    drag_split: 0.35,
+    add_point: 0.25,
+    hover_storm: 0.25,
+    toggle: 0.1,
+    grow_tree: 0.05,
+}
+
+
+async def simulate(url, results, stop_at, think, seed):
+    rng = random.Random(seed)
+    session = Session(url, results)
+    try:
+        await session.connect()
+        results.sessions_connected += 1
+        scenarios, weights = zip(*SCENARIOS.items())
+        while time.perf_counter() < stop_at:
+            await asyncio.sleep(rng.uniform(*think))
+            scenario = rng.choices(scenarios, weights)[0]
+            await scenario(session, rng)
+        await session.close()
+    except (OSError, ConnectionError, websockets.WebSocketException) as e:
+        results.error(f"{type(e).__name__}: {e}")
+
+
+class Results:
+    """
+    Everything measured during a run.
+    """
+
+    def __init__(self):
+        self.latencies = defaultdict(list)  # kind of action -> seconds
+        self.errors = defaultdict(int)
+        self.bytes_received = 0
+        self.sessions_connected = 0
+
+    def latency(self, kind, seconds):
+        self.latencies[kind].append(seconds)
+
+    def error(self, message):
+        self.errors[message] += 1
+
+    def received(self, size):
+        self.bytes_received += size
+
+
+def process_tree(pid):
+    # pid and every process under it (e.g. workers a launcher started)
+    children = defaultdict(list)
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    # The name can have spaces in it, so split after its closing bracket
+                    parent = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children[parent].append(int(entry))
+    pids = [pid]
+    for p in pids:
+        pids.extend(children[p])
+    return pids
+
+
+def usage(pid):
+    # (CPU seconds used so far, resident memory in bytes) of pid and the processes under it
+    ticks = os.sysconf("SC_CLK_TCK")
+    page = os.sysconf("SC_PAGE_SIZE")
+    cpu = memory = 0
+    for p in process_tree(pid):
+        try:
+            with open(f"/proc/{p}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            with open(f"/proc/{p}/statm") as f:
+                memory += int(f.read().split()[1]) * page
+        except (OSError, IndexError, ValueError):
+            continue
+        # utime and stime are the 14th and 15th fields of stat
+        cpu += (int(fields[11]) + int(fields[12])) / ticks
+    return cpu, memory
+
+
+async def sample_usage(pid, samples, interval=0.5):
+    while True:
+        samples.append((time.perf_counter(),) + usage(pid))
+        await asyncio.sleep(interval)
+
+
+def start_server():
+    # Run the app on a free port, and wait until it answers
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = subprocess.Popen(
+        [sys.executable, "-m", "shiny", "run", "app.py", "--port", str(port)],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(url + "/", timeout=1).read()
+            return server, url
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("The app didn't start")
+
+
+def report(results, samples, args, elapsed):
+    print(f"\n{results.sessions_connected}/{args.sessions} sessions connected, "
+          f"{elapsed:.0f}s, {results.bytes_received / 1e6:.1f} MB received")
+    print(f"\n{'action':<16} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    summary = {}
+    for kind, seconds in sorted(results.latencies.items()):
+        ms = np.array(seconds) * 1000
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        summary[kind] = {'count': len(ms), 'p50': p50, 'p95': p95, 'p99': p99, 'max': ms.max()}
+        print(f"{kind:<16} {len(ms):>7} {p50:>9.1f} {p95:>9.1f} {p99:>9.1f} {ms.max():>9.1f}")
+    if results.errors:
+        print("\nErrors:")
+        for message, n in sorted(results.errors.items(), key=lambda item: -item[1]):
+            print(f"  {n:>5} x {message}")
+
+    server = None
+    if len(samples) >= 2:
+        (t0, cpu0, memory0), (t1, cpu1, _) = samples[0], samples[-1]
+        peak = max(memory for _, _, memory in samples)
+        n = max(1, results.sessions_connected)
+        server = {
+            'cpu_percent': 100 * (cpu1 - cpu0) / (t1 - t0),
+            'cpu_seconds_per_session': (cpu1 - cpu0) / n,
+            'memory_before_mb': memory0 / 1e6,
+            'memory_peak_mb': peak / 1e6,
+            'memory_per_session_mb': (peak - memory0) / 1e6 / n,
+        }
+        print(f"\nServer: {server['cpu_percent']:.0f}% CPU on average (100% = one core), "
+              f"{server['cpu_seconds_per_session']:.2f} CPU seconds per session")
+        print(f"        {server['memory_before_mb']:.0f} MB before, {server['memory_peak_mb']:.0f} MB at most, "
+              f"{server['memory_per_session_mb']:.1f} MB per session")
+    if args.json:
+        args.json.write_text(json.dumps({
+            'sessions': args.sessions, 'connected': results.sessions_connected, 'seconds': elapsed,
+            'latency_ms': summary, 'errors': dict(results.errors), 'server': server,
+        }, indent=1) + "\n")
+
+
+async def run(args, url, pid):
+    results = Results()
+    samples = []
+    sampler = asyncio.create_task(sample_usage(pid, samples)) if pid else None
+    # Let the sampler get a reading from before anyone connects
+    await asyncio.sleep(0.6 if pid else 0)
+    start = time.perf_counter()
+    stop_at = start + args.ramp + args.duration
+    tasks = []
+    for i in range(args.sessions):
+        # Sessions join spread out over the ramp-up time, like a class arriving
+        tasks.append(asyncio.create_task(simulate(url, results, stop_at, args.think, args.seed + i)))
+        await asyncio.sleep(args.ramp / args.sessions)
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    if sampler:
+        sampler.cancel()
+        samples.append((time.perf_counter(),) + usage(pid))
+    report(results, samples, args, elapsed)
+    return 1 if results.errors else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the app with many simulated sessions at once.")
+    parser.add_argument("--url", help="app to test, e.g. http://127.0.0.1:8000 (default: start one)")
+    parser.add_argument("--pid", type=int, help="server process to measure CPU/memory of, with --url")
+    parser.add_argument("--sessions", type=int, default=20, help="sessions at once")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to keep going once everyone's joined")
+    parser.add_argument("--ramp", type=float, default=5, help="seconds over which the sessions join")
+    parser.add_argument("--think", type=float, nargs=2, default=(1, 3), metavar=("MIN", "MAX"),
+                        help="seconds each session pauses between actions")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, help="also save the results here")
+    args = parser.parse_args()
+
+    server = None
+    url, pid = args.url, args.pid
+    if url is None:
+        server, url = start_server()
+        pid = server.pid
+    elif pid is None:
+        print("(no --pid, so the server's CPU and memory won't be measured)")
+    try:
+        return asyncio.run(run(args, url, pid))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+from functools import lru_cache
+from string import Template
+
+from dataset import CLASSES
+from texhtml import render_inline_math
+
+# The information gain equations shown in the Calculations card, one line per step.
+# Each line is written out once, when the app starts, as a string.Template where
+# the numbers from calculate() go in as $fields (e.g. $h_y, $side1, $count0 for
+# the first class's count), so showing the equations is just filling those in.
+
+
+# Helper function to make tooltips
+def tooltip_test(id, tip, content):
+    return f"""<span id="{id}" class="tooltip-custom" data-tooltip="{tip}">\\( {content} \\)</span>"""
+
+# Javascript that reacts to each tooltip being hovered, as (tooltip id, input id) pairs
+# (see hoverTooltip in the scripts in app.py)
+def hover_listeners(pairs):
+    return "\n".join(f"""
+                document.getElementById("{element_id}").addEventListener("mouseenter", function() {{
+                    hoverTooltip("{input_id}", true);
+                }});
+                document.getElementById("{element_id}").addEventListener("mouseleave", function() {{
+                    hoverTooltip("{input_id}", false);
+                }});""" for element_id, input_id in pairs)
+
+# Name of each class in input ids, e.g. btn_all_oranges
+def class_key(cls):
+    return cls['plural'].lower()
+
+# One "p log p" term per class for an entropy equation, joined by minus signs
+# element_id and tip are filled in with each class's plural name,
+# and counts/total are the fields its fraction comes from
+def entropy_terms(element_id, tip, counts, total):
+    terms = []
+    for label, cls in enumerate(CLASSES):
+        fraction = "\\frac{$%s%d}{$%s}" % (counts, label, total)
+        terms.append(tooltip_test(
+            element_id.format(plural=cls['plural'], lower=cls['plural'].lower()),
+            tip.format(plural=cls['plural'], lower=cls['plural'].lower()),
+            f"{fraction} \\log_{{2}} {fraction}"
+        ))
+    return "\n<span>\\(-\\)</span>\n".join(terms)
+
+
+CLASS_LIST = ", ".join(cls['plural'] for cls in CLASSES)
+
+# H(Y)
+LINE_TEMPLATES = [f"""
+            <div style="text-align: center; font-size: 20px; font-weight: normal; color: #1F4A89; line-height: 1;">
+                <span>\\(H(\\)</span>
+                {tooltip_test("Y", f"({CLASS_LIST})", "Y")}
+                <span>\\()=-\\)</span>
+                {entropy_terms("Total {lower}", "Total {lower} / Total datapoints", "count", "total")}
+                <span>\\( \\approx$h_y \\)
+            </div>
+
+            <script>
+                {hover_listeners((f"Total {class_key(cls)}", f"btn_all_{class_key(cls)}") for cls in CLASSES)}
+
+                updateMathJax();
+            </script>
+        """]
+
+# H(Y|X = side 1) and H(Y|X = side 2)
+for side in (1, 2):
+    LINE_TEMPLATES.append(f"""
+            <div style="text-align: center; font-size: 20px; font-weight: normal; color: #1F4A89; line-height: 1;">
+                <span>\\(H(\\)</span>
+                {tooltip_test("Y", CLASS_LIST, "Y")}
+                <span>\\(|\\)</span>
+                {tooltip_test(f"X side {side}", f"Only looking at the $side{side} side of the split", f"X = $side{side}")}
+                <span>\\()=-\\)</span>
+                {entropy_terms(f"{{plural}} side {side}", f"Total {{lower}} ($side{side}) / Total datapoints ($side{side})", f"side{side}_count", f"side{side}s")}
+                <span>\\( \\approx$h_yside{side} \\)
+            </div>
+
+            <script>
+                {hover_listeners([(f"X side {side}", f"btn_X_side{side}")] + [(f"{cls['plural']} side {side}", f"btn_{class_key(cls)}_side{side}") for cls in CLASSES])}
+
+                updateMathJax();
+            </script>
+        """)
+
+# H(Y|X)
+LINE_TEMPLATES.append(f"""
+            <div style="text-align: center; font-size: 20px; font-weight: normal; color: #1F4A89; line-height: 1;">
+                <span>\\(H(\\)</span>
+                {tooltip_test("Y", CLASS_LIST, "Y")}
+                <span>\\(|\\)</span>
+                {tooltip_test("X", "$side1, $side2", "X")}
+                <span>\\()=\\)</span>
+                {tooltip_test("Side 1", "Total $side1 datapoints / Total datapoints", "\\frac{$side1s}{$total}")}
+                <span>\\(\\cdot\\)</span>
+                {tooltip_test("Hy Side 1", "H(Y|X=$side1)", "$h_yside1")}
+                <span>\\(+\\)</span>
+                {tooltip_test("Side 2", "Total $side2 datapoints / Total datapoints", "\\frac{$side2s}{$total}")}
+                <span>\\(\\cdot\\)</span>
+                {tooltip_test("Hy Side 2", "H(Y|X=$side2)", "$h_yside2")}
+                <span>\\( \\approx$h_yx \\)
+            </div>
+
+            <script>
+                {hover_listeners([("Side 1", "btn_side1"), ("Side 2", "btn_side2")])}
+
+                updateMathJax();
+            </script>
+        """)
+
+# IG(Y|X)
+LINE_TEMPLATES.append(f"""
+            <div style="text-align: center; font-size: 20px; font-weight: normal; color: #1F4A89; line-height: 1;">
+                {tooltip_test("infogain", "Information gain from this split", "IG(Y|X)")}
+                <span>\\(=\\)</span>
+                {tooltip_test("Hy", "H(Y)", "$h_y")}
+                <span>\\(-\\)</span>
+                {tooltip_test("Hyx", "H(Y|X)", "$h_yx")}
+                <span>\\(\\approx $infogain\\)</span>
+            </div>
+
+            <script>
+                {hover_listeners([("Hy", "btn_Hy"), ("Hyx", "btn_Hyx")])}
+
+                updateMathJax();
+            </script>
+        """)
+
+# Blank line in place of each step that isn't shown yet, to keep formatting the same
+BLANK_LINE = """
+            <div style="text-align: center; font-size: 20px; font-weight: normal; color: #fff; line-height: 1;">
+                <span>\\(IG(Y|X)\\)</span>
+            </div>
+        """
+
+# The same lines already laid out as HTML (see texhtml.py), for when the server
+# renders the maths instead of MathJax (SERVER_MATH in app.py)
+def prerender(line):
+    return render_inline_math(line).replace("updateMathJax();", "")
+
+# [prerendered][step] template, and [prerendered] blank line
+LINE_TEMPLATES = {
+    False: [Template(line) for line in LINE_TEMPLATES],
+    True: [Template(prerender(line)) for line in LINE_TEMPLATES],
+}
+BLANK_LINES = {False: BLANK_LINE, True: prerender(BLANK_LINE)}
+STEPS = len(LINE_TEMPLATES[False])
+
+
+# Create the information gain calculations in mathjax
+# Show equations corresponding to what step of the calculation the user is on
+# info is the dictionary from calculate() in app.py
+# With prerender on, the maths comes back as plain HTML that doesn't need MathJax
+def create_mathjax_content(info, step, prerender=False):
+    fields = {}
+    for name, value in info.items():
+        if isinstance(value, list):
+            # Per-class counts, e.g. counts -> count0, count1, ...
+            prefix = name[:-1]
+            for label, n in enumerate(value):
+                fields[f"{prefix}{label}"] = n
+        else:
+            fields[name] = value
+    return render_lines(tuple(sorted(fields.items())), step, prerender)
+
+# Moving the slider within the same pair of points, stepping back and forth,
+# or flipping the split direction and back all give the same fields again,
+# so the markup is remembered instead of rebuilt
+@lru_cache(maxsize=256)
+def render_lines(fields, step, prerender):
+    fields = dict(fields)
+    # Only fill in the lines up to the current step
+    shown = "".join(template.substitute(fields) for template in LINE_TEMPLATES[prerender][:step])
+    return shown + BLANK_LINES[prerender] * (STEPS - step)
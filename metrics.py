@@ -0,0 +1,312 @@
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from shiny import reactive
+from shiny.session import get_current_session
+from shiny.types import SilentException
+
+# Optional timing of the app's effects and outputs (turned on by METRICS in app.py).
+# For every function wrapped with @instrument this counts how often it runs, how long
+# it takes (as a histogram), and which inputs made it run, and for every session it
+# counts the bytes sent to the browser. It's shared by every session in the process,
+# and can be read at http://127.0.0.1:<port>/metrics (in Prometheus' text format) or
+# in the debug panel at the bottom of the app.
+# While it's off, @instrument returns functions unchanged, so it costs nothing.
+
+ENABLED = False
+# Upper bounds of the time histogram's buckets, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+# What runs are put down to when no input changed (e.g. ratelimit.py's timers firing,
+# or an input being set for the first time), and the session's first flush
+NO_INPUT = "(other)"
+STARTUP = "(startup)"
+
+
+class Registry:
+    """
+    Every number being recorded, in plain dicts keyed by label.
+    The metrics server reads it from another thread, so changes go through the lock.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = defaultdict(int)       # function -> runs
+        self.errors = defaultdict(int)      # function -> runs that raised (not counting req())
+        self.seconds = defaultdict(float)   # function -> total time
+        self.buckets = defaultdict(lambda: [0] * (len(BUCKETS) + 1))  # function -> histogram (last is +Inf)
+        self.cascades = defaultdict(int)    # (input, function) -> runs it caused
+        self.sent_bytes = defaultdict(int)  # (kind, name) -> bytes sent to the browser
+        self.sent_messages = defaultdict(int)
+        self.sessions = 0
+
+    def record_call(self, name, seconds, error, causes):
+        with self.lock:
+            self.calls[name] += 1
+            self.seconds[name] += seconds
+            if error:
+                self.errors[name] += 1
+            bucket = next((i for i, bound in enumerate(BUCKETS) if seconds <= bound), len(BUCKETS))
+            self.buckets[name][bucket] += 1
+            for cause in causes or (NO_INPUT,):
+                self.cascades[cause, name] += 1
+
+    def record_sent(self, kind, name, size):
+        with self.lock:
+            self.sent_bytes[kind, name] += size
+            self.sent_messages[kind, name] += 1
+
+    def percentile(self, name, q):
+        # Upper bound of the bucket the q-th quantile falls in (None if it's past the last one)
+        counts = self.buckets[name]
+        target = q * sum(counts)
+        seen = 0
+        for bound, count in zip(BUCKETS + (None,), counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return None
+
+    def prometheus(self):
+        # Everything in Prometheus' text exposition format
+        lines = []
+
+        def metric(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def labels(**values):
+            return ",".join(f'{key}="{str(value).replace(chr(34), chr(39))}"' for key, value in values.items())
+
+        with self.lock:
+            metric("dt_sessions", "gauge", "Sessions currently connected")
+            lines.append(f"dt_sessions {self.sessions}")
+            metric("dt_function_calls_total", "counter", "Times each instrumented effect/output ran")
+            for name, n in sorted(self.calls.items()):
+                lines.append(f"dt_function_calls_total{{{labels(function=name)}}} {n}")
+            metric("dt_function_errors_total", "counter", "Runs that raised an error")
+            for name, n in sorted(self.errors.items()):
+                lines.append(f"dt_function_errors_total{{{labels(function=name)}}} {n}")
+            metric("dt_function_seconds", "histogram", "How long each run took")
+            for name, counts in sorted(self.buckets.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS, counts):
+                    cumulative += count
+                    lines.append(f"dt_function_seconds_bucket{{{labels(function=name, le=bound)}}} {cumulative}")
+                lines.append(f"dt_function_seconds_bucket{{{labels(function=name, le='+Inf')}}} {sum(counts)}")
+                lines.append(f"dt_function_seconds_sum{{{labels(function=name)}}} {self.seconds[name]:.6f}")
+                lines.append(f"dt_function_seconds_count{{{labels(function=name)}}} {sum(counts)}")
+            metric("dt_cascade_total", "counter", "Runs of each function caused by each changed input")
+            for (cause, name), n in sorted(self.cascades.items()):
+                lines.append(f"dt_cascade_total{{{labels(input=cause, function=name)}}} {n}")
+            metric("dt_sent_bytes_total", "counter", "Bytes sent to browsers, by message kind and output/message name")
+            for (kind, name), n in sorted(self.sent_bytes.items()):
+                lines.append(f"dt_sent_bytes_total{{{labels(kind=kind, name=name)}}} {n}")
+            metric("dt_sent_messages_total", "counter", "Messages sent to browsers, by message kind and output/message name")
+            for (kind, name), n in sorted(self.sent_messages.items()):
+                lines.append(f"dt_sent_messages_total{{{labels(kind=kind, name=name)}}} {n}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+# Session -> the inputs that changed since it last finished flushing (see track_session)
+_causes = {}
+_server = None
+
+
+def enable(port=None):
+    # Turn instrumentation on for this process, and serve /metrics on port if given
+    # Safe to call again (app.py runs once per session), it only starts one server
+    global ENABLED, _server
+    ENABLED = True
+    if port is not None and _server is None:
+        _server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+        threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        # Don't print a line for every scrape
+        pass
+
+
+def instrument(fn=None, *, name=None):
+    # Record every run of an effect or output. Goes directly above the def, under
+    # @reactive.effect/@reactive.event/@render.*, e.g.
+    #     @reactive.effect
+    #     @reactive.event(input.add_dp)
+    #     @instrument
+    #     def add_dp(): ...
+    # name defaults to the function's name (use it for functions made in a loop)
+    if fn is None:
+        return lambda fn: instrument(fn, name=name)
+    if not ENABLED:
+        return fn
+    name = name or fn.__name__
+
+    def record(start, error):
+        session = get_current_session()
+        causes = _causes.get(session) if session is not None else None
+        REGISTRY.record_call(name, time.perf_counter() - start, error, causes)
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            error = False
+            try:
+                return await fn(*args, **kwargs)
+            except SilentException:
+                raise
+            except Exception:
+                error = True
+                raise
+            finally:
+                record(start, error)
+    elif inspect.isgeneratorfunction(fn):
+        # e.g. downloads, which yield the file's contents
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            error = False
+            try:
+                return (yield from fn(*args, **kwargs))
+            except SilentException:
+                raise
+            except Exception:
+                error = True
+                raise
+            finally:
+                record(start, error)
+    else:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            error = False
+            try:
+                return fn(*args, **kwargs)
+            except SilentException:
+                raise
+            except Exception:
+                error = True
+                raise
+            finally:
+                record(start, error)
+    return wrapper
+
+
+def track_session(session):
+    # Start recording which inputs change in each flush of this session (so instrumented
+    # functions know what caused them to run) and how much is sent to its browser
+    # (the page itself is made with a stand-in session, which never connects)
+    if not ENABLED or session.is_stub_session():
+        return
+    causes = _causes[session] = {STARTUP}
+    watched = set()
+
+    def watch(input_id):
+        # Runs before everything else in a flush whenever this input was set
+        # (its first run is just from the effect being made, so that's not counted)
+        first_run = True
+
+        @reactive.effect(priority=1000)
+        def _record_cause():
+            nonlocal first_run
+            value = session.input[input_id]
+            if value.is_set():
+                value()
+                if not first_run:
+                    causes.add(input_id)
+            first_run = False
+
+    def watch_new_inputs():
+        # Inputs can appear at any time (e.g. once a tooltip is first hovered)
+        for input_id in dir(session.input):
+            if input_id not in watched and not input_id.startswith("."):
+                watched.add(input_id)
+                watch(input_id)
+
+    def end_cycle():
+        causes.clear()
+        watch_new_inputs()
+
+    # Everything sent to the browser goes through session._send_message, so wrap it to
+    # count the bytes. Shiny has no public hook that sees outputs' values as they're sent,
+    # so this relies on a private method: Requirements.txt pins the shiny version it was
+    # checked against, and if it's ever gone the byte counts are just left out
+    send = getattr(session, "_send_message", None)
+
+    async def counted_send(message):
+        for kind, content in message.items():
+            if isinstance(content, dict) and kind in ("values", "custom", "errors"):
+                for name, value in content.items():
+                    REGISTRY.record_sent(kind, name, _json_size(value))
+            else:
+                REGISTRY.record_sent(kind, "", _json_size(content))
+        await send(message)
+
+    if send is not None:
+        session._send_message = counted_send
+
+    def end_session():
+        _causes.pop(session, None)
+        with REGISTRY.lock:
+            REGISTRY.sessions -= 1
+
+    with REGISTRY.lock:
+        REGISTRY.sessions += 1
+    watch_new_inputs()
+    session.on_flushed(end_cycle, once=False)
+    session.on_ended(end_session)
+
+
+def _json_size(value):
+    # About how many bytes value takes in a message. Strings are counted as they are,
+    # so messages that are already JSON (e.g. every plot update from shinywidgets)
+    # aren't encoded a second time just to be measured
+    return len(value) if isinstance(value, str) else len(json.dumps(value))
+
+
+def summary_html(limit=15):
+    # The debug panel's tables: the slowest functions, the biggest cascades and what's sent most
+    def table(header, rows):
+        head = "".join(f"<th>{cell}</th>" for cell in header)
+        body = "".join("<tr>" + "".join(f"<td>{cell}</td>" for cell in row) + "</tr>" for row in rows)
+        return f'<table class="table table-sm" style="font-size: 13px;"><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>'
+
+    def bound(seconds):
+        return "> 5 s" if seconds is None else f"≤ {seconds * 1000:g} ms"
+
+    with REGISTRY.lock:
+        functions = sorted(REGISTRY.calls, key=lambda name: -REGISTRY.seconds[name])[:limit]
+        function_rows = [
+            (name, REGISTRY.calls[name], REGISTRY.errors.get(name, 0), f"{REGISTRY.seconds[name] * 1000:.1f}",
+             f"{REGISTRY.seconds[name] * 1000 / REGISTRY.calls[name]:.2f}",
+             bound(REGISTRY.percentile(name, 0.95)))
+            for name in functions
+        ]
+        cascade_rows = sorted(REGISTRY.cascades.items(), key=lambda item: -item[1])[:limit]
+        sent_rows = sorted(REGISTRY.sent_bytes.items(), key=lambda item: -item[1])[:limit]
+        sent_rows = [(kind, name, REGISTRY.sent_messages[kind, name], n) for (kind, name), n in sent_rows]
+        sessions = REGISTRY.sessions
+    return (
+        f"<p>{sessions} session(s) connected</p>"
+        + table(("Function", "Runs", "Errors", "Total ms", "Mean ms", "95% under"), function_rows)
+        + table(("Input", "Made this run", "Times"), [(cause, name, n) for (cause, name), n in cascade_rows])
+        + table(("Sent as", "Name", "Messages", "Bytes"), sent_rows)
+    )
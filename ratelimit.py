@@ -0,0 +1,87 @@
+import time
+
+from shiny import reactive
+
+# Limits on how often a fast-changing input (like the split slider being dragged)
+# can make everything downstream of it recompute.
+# Both take a reactive source (e.g. input.split_loc) and return a reactive.calc
+# that follows it more slowly. Whenever the calc does update it's to the source's
+# latest value, so values that were already replaced while waiting are skipped
+# rather than queued up.
+# Must be called inside a session (e.g. at the top level of app.py).
+
+
+def debounce(delay, source):
+    # Only updates once the source has stopped changing for delay seconds
+    # (for typing in a box, where only the final value matters)
+    deadline = reactive.value(None)
+    fired = reactive.value(0)
+    first_run = True
+
+    @reactive.effect(priority=102)
+    def _watch():
+        nonlocal first_run
+        source()
+        # The calc below already starts out on the first value, so only later ones wait
+        if first_run:
+            first_run = False
+            return
+        deadline.set(time.monotonic() + delay)
+
+    @reactive.effect(priority=101)
+    def _wait():
+        due = deadline.get()
+        if due is None:
+            return
+        remaining = due - time.monotonic()
+        if remaining > 0:
+            reactive.invalidate_later(remaining)
+            return
+        with reactive.isolate():
+            deadline.set(None)
+            fired.set(fired.get() + 1)
+
+    @reactive.calc
+    def debounced():
+        fired.get()
+        with reactive.isolate():
+            return source()
+
+    return debounced
+
+
+def throttle(delay, source):
+    # Updates at most once every delay seconds while the source keeps changing,
+    # and always ends up on its last value (for dragging, where you want to see
+    # things move but not recompute for every single step)
+    last_fired = reactive.value(float("-inf"))
+    pending = reactive.value(False)
+    fired = reactive.value(0)
+
+    @reactive.effect(priority=102)
+    def _watch():
+        source()
+        with reactive.isolate():
+            pending.set(True)
+
+    @reactive.effect(priority=101)
+    def _wait():
+        if not pending.get():
+            return
+        with reactive.isolate():
+            remaining = last_fired.get() + delay - time.monotonic()
+        if remaining > 0:
+            reactive.invalidate_later(remaining)
+            return
+        with reactive.isolate():
+            pending.set(False)
+            last_fired.set(time.monotonic())
+            fired.set(fired.get() + 1)
+
+    @reactive.calc
+    def throttled():
+        fired.get()
+        with reactive.isolate():
+            return source()
+
+    return throttled
@@ -0,0 +1,41 @@
+# shiny_mode: core
+# Runs app.py with long-lived caching for the static files that never change
+# without their address changing too (the math renderer in www/math, see
+# TEXMATH_URL in app.py), so returning visitors don't download them again:
+#     shiny run serve.py
+# This is how the app should be run and deployed (e.g. rsconnect deploy shiny . --entrypoint serve:app),
+# since Shiny Express has no way to set these headers from app.py itself.
+# (`shiny run app.py` still works, the browser just checks back for those files)
+from pathlib import Path
+
+from shiny.express import wrap_express_app
+
+# Static paths that get the long-lived cache headers
+CACHED_PATHS = ("/math/",)
+CACHE_CONTROL = b"public, max-age=31536000, immutable"
+
+
+class CacheStaticFiles:
+    """
+    ASGI middleware that adds a Cache-Control header to responses for CACHED_PATHS.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(CACHED_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cache_control(message):
+            if message["type"] == "http.response.start":
+                headers = [(k, v) for k, v in message.get("headers", []) if k.lower() != b"cache-control"]
+                headers.append((b"cache-control", CACHE_CONTROL))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_cache_control)
+
+
+app = CacheStaticFiles(wrap_express_app(Path(__file__).parent / "app.py"))
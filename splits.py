@@ -0,0 +1,157 @@
+import numpy as np
+
+from entropy import infogains, table_infogain
+
+# Split counting
+# A split's counts are stored as a table where table[side, label] is how many
+# points with that label are on that side of the split.
+# Side 0 is everything strictly less than the threshold (left/below),
+# side 1 is everything else (right/above), the same as in calculate().
+
+
+def count_split(values, labels, threshold, n_classes=2):
+    # Counts for a single split, with one mask-and-sum pass per class
+    # values are the coordinates along the split axis (points.x or points.y)
+    below = values < threshold
+    table = np.empty((2, n_classes), dtype=np.int64)
+    for label in range(n_classes):
+        is_label = labels == label
+        table[0, label] = np.count_nonzero(below & is_label)
+        table[1, label] = np.count_nonzero(is_label) - table[0, label]
+    return table
+
+
+def count_splits(values, labels, thresholds, n_classes=2):
+    # Counts for many thresholds at once, returned as an array of tables
+    # with shape (len(thresholds), 2, n_classes)
+    # Each class is sorted once, then every threshold is a binary search,
+    # so this is O((n + len(thresholds)) log n) instead of a pass per threshold
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    tables = np.empty((len(thresholds), 2, n_classes), dtype=np.int64)
+    for label in range(n_classes):
+        class_values = np.sort(values[labels == label])
+        below = np.searchsorted(class_values, thresholds, side="left")
+        tables[:, 0, label] = below
+        tables[:, 1, label] = len(class_values) - below
+    return tables
+
+
+# Axes a split can be on (a vertical split is on the x axis)
+X_AXIS = 0
+Y_AXIS = 1
+
+
+class SplitIndex:
+    """
+    Keeps each class's coordinates sorted along both axes.
+    The number of points of a class below a threshold is then just where the
+    threshold would be inserted into that class's sorted coordinates (a
+    binary search), so counting a split is O(log n) instead of O(n).
+    Adding or removing a point finds its spot with a binary search too, so the
+    index never has to be re-sorted, but np.insert/np.delete copy the class's
+    array each time, so each change is still O(n). Only counting is O(log n).
+    """
+
+    def __init__(self, n_classes=2):
+        self.n_classes = n_classes
+        # _sorted[axis][label] is a sorted array of that class's coordinates
+        self._sorted = [[np.empty(0, dtype=np.float64) for _ in range(n_classes)] for _ in range(2)]
+
+    @classmethod
+    def from_points(cls, x, y, labels, n_classes=2):
+        index = cls(n_classes)
+        for axis, values in ((X_AXIS, x), (Y_AXIS, y)):
+            for label in range(n_classes):
+                index._sorted[axis][label] = np.sort(values[labels == label])
+        return index
+
+    def insert(self, x, y, label):
+        for axis, value in ((X_AXIS, x), (Y_AXIS, y)):
+            class_values = self._sorted[axis][label]
+            i = np.searchsorted(class_values, value)
+            self._sorted[axis][label] = np.insert(class_values, i, value)
+
+    def insert_many(self, x, y, labels):
+        # Merge a whole batch of points in with one sort per class and axis
+        for axis, values in ((X_AXIS, x), (Y_AXIS, y)):
+            for label in range(self.n_classes):
+                new_values = values[labels == label]
+                if len(new_values):
+                    self._sorted[axis][label] = np.sort(np.concatenate((self._sorted[axis][label], new_values)))
+
+    def remove(self, x, y, label):
+        for axis, value in ((X_AXIS, x), (Y_AXIS, y)):
+            class_values = self._sorted[axis][label]
+            i = np.searchsorted(class_values, value)
+            self._sorted[axis][label] = np.delete(class_values, i)
+
+    def count(self, label):
+        return len(self._sorted[X_AXIS][label])
+
+    def count_split(self, axis, threshold):
+        # Same table as count_split() above, from one binary search per class
+        table = np.empty((2, self.n_classes), dtype=np.int64)
+        for label, class_values in enumerate(self._sorted[axis]):
+            below = np.searchsorted(class_values, threshold, side="left")
+            table[0, label] = below
+            table[1, label] = len(class_values) - below
+        return table
+
+    def count_splits(self, axis, thresholds):
+        # Same tables as count_splits() above, without having to sort first
+        thresholds = np.asarray(thresholds, dtype=np.float64)
+        tables = np.empty((len(thresholds), 2, self.n_classes), dtype=np.int64)
+        for label, class_values in enumerate(self._sorted[axis]):
+            below = np.searchsorted(class_values, thresholds, side="left")
+            tables[:, 0, label] = below
+            tables[:, 1, label] = len(class_values) - below
+        return tables
+
+
+# Best split search
+def candidate_splits(values, labels, n_classes=2):
+    # Every split worth trying along one axis, found in one sorted pass:
+    # a threshold halfway between each pair of neighbouring distinct values.
+    # Returns the thresholds and their tables (same layout as count_splits)
+    if len(values) == 0:
+        # No points, so nothing to split (e.g. after "Remove all datapoints")
+        return np.empty(0, dtype=np.float64), np.empty((0, 2, n_classes), dtype=np.int64)
+    order = np.argsort(values, kind="stable")
+    sorted_values = values[order]
+    # counts[i, label] = how many of the first i+1 sorted points have that label
+    counts = np.zeros((len(values), n_classes), dtype=np.int64)
+    counts[np.arange(len(values)), labels[order]] = 1
+    np.cumsum(counts, axis=0, out=counts)
+    gaps = np.flatnonzero(sorted_values[1:] > sorted_values[:-1])
+    thresholds = (sorted_values[gaps] + sorted_values[gaps + 1]) / 2
+    tables = np.empty((len(gaps), 2, n_classes), dtype=np.int64)
+    tables[:, 0] = counts[gaps]
+    tables[:, 1] = counts[-1] - counts[gaps]
+    return thresholds, tables
+
+
+def best_splits(x, y, labels, k=5, n_classes=2):
+    # The k splits (over both axes) with the highest information gain, best first
+    # Each one is a dict with its axis, threshold, table and the rounded
+    # information gain calculate() would show for it
+    # O(n log n) overall, since each axis only needs one sort
+    axes, thresholds, tables = [], [], []
+    for axis, values in ((X_AXIS, x), (Y_AXIS, y)):
+        axis_thresholds, axis_tables = candidate_splits(values, labels, n_classes)
+        axes.append(np.full(len(axis_thresholds), axis))
+        thresholds.append(axis_thresholds)
+        tables.append(axis_tables)
+    axes = np.concatenate(axes)
+    thresholds = np.concatenate(thresholds)
+    tables = np.concatenate(tables)
+    # Rank on the exact gains (ties keep x before y, and lower thresholds first)
+    ranked = np.argsort(-infogains(tables), kind="stable")[:k]
+    return [
+        {
+            'axis': int(axes[i]),
+            'threshold': float(thresholds[i]),
+            'table': tables[i],
+            'infogain': table_infogain(tables[i]),
+        }
+        for i in ranked
+    ]
@@ -0,0 +1,110 @@
+import os
+from contextlib import contextmanager
+
+import numpy as np
+from shiny import reactive
+
+from dataset import LEMON, ORANGE, Dataset
+
+# Most datapoints a single session can hold, so one open tab can't grow the
+# worker's memory without bound. The default is the largest size figures.py's binned
+# mode and benchmarks/bench.py are made for; a session that full takes about 60 MB
+# (around 100 MB while adding or removing points in bulk), so lower it with the
+# MAX_POINTS environment variable on a small server, e.g. MAX_POINTS=100000 shiny run serve.py
+MAX_POINTS = int(os.environ.get("MAX_POINTS", 1_000_000))
+
+
+class SessionState:
+    """
+    Every reactive value one browser session needs, in one place.
+    A new SessionState is made when a session connects (see the top of app.py),
+    and close() drops everything it holds once that session ends.
+    Because each session gets its own copy, a user action only invalidates the
+    outputs of the session that made it.
+    """
+
+    def __init__(self):
+        # Starter datapoints to plot and other reactive value setups
+        self.points = Dataset.from_points(
+            x=[1, 2, 4, 8, 7, 5, 8],
+            y=[3, 7, 6, 5, 4, 4, 2],
+            label=[ORANGE] * 5 + [LEMON] * 2,
+        )
+        # The dataset is changed in place, so these are bumped to tell
+        # everything that depends on the points (or their highlighting) to update
+        self.points_version = reactive.value(0)
+        self.highlight_version = reactive.value(0)
+        # How many batch() blocks we're inside, and the points from before the outermost one
+        self._batch_depth = 0
+        self._batch_backup = None
+        # For adding random datapoints
+        self.rng = np.random.default_rng()
+        self.x_coord = reactive.value(0)
+        self.y_coord = reactive.value(0)
+        self.vertical_split = reactive.value(True)
+        self.split_loc = reactive.value(3)
+        self.step = reactive.value(5)
+        self.show_rect = reactive.value(0)
+        self.rect_coords = reactive.value([0, 0, 0, 0])
+        self.notation = reactive.value(False)
+        self.variables = reactive.value(False)
+        self.definition = reactive.value(False)
+        # Last equations sent to the browser (not reactive, see calculations_mathjax)
+        self.shown_calculations = None
+
+    def get_points(self):
+        # Returns the dataset, and makes the caller update whenever the points change
+        self.points_version.get()
+        return self.points
+
+    def get_highlighted_points(self):
+        # Same as get_points, but also updates when the highlighting changes
+        self.highlight_version.get()
+        return self.get_points()
+
+    def points_changed(self):
+        if self._batch_depth:
+            # batch() bumps the version once it's done
+            return
+        with reactive.isolate():
+            self.points_version.set(self.points_version.get() + 1)
+
+    @contextmanager
+    def batch(self):
+        # Make any number of changes to the points, with everything that depends on
+        # them updating once at the end instead of after every change, e.g.
+        #     with state.batch() as points:
+        #         points.extend(x, y, labels)
+        #         points.remove(points.in_region(0, 5, 0, 5))
+        # If something goes wrong partway through, the points go back to how they were
+        # Batches can be nested, only the outermost one counts
+        if self._batch_depth == 0:
+            self._batch_backup = self.points.copy()
+        self._batch_depth += 1
+        try:
+            yield self.points
+        except BaseException:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self.points = self._batch_backup
+                self._batch_backup = None
+            raise
+        self._batch_depth -= 1
+        if self._batch_depth == 0:
+            self._batch_backup = None
+            self.points_changed()
+
+    def highlight_changed(self):
+        with reactive.isolate():
+            self.highlight_version.set(self.highlight_version.get() + 1)
+
+    def is_full(self):
+        return len(self.points) >= MAX_POINTS
+
+    def room(self):
+        # How many more datapoints fit before MAX_POINTS
+        return max(0, MAX_POINTS - len(self.points))
+
+    def close(self):
+        # Drop the references so the datapoints can be freed as soon as the session ends
+        self.__dict__.clear()
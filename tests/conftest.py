@@ -0,0 +1,5 @@
+# Run from anywhere: the app's modules are in the folder above this one (same as benchmarks/bench.py)
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,119 @@
+import json
+
+import numpy as np
+import pytest
+
+from core import file_format, read_points
+
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text)
+    return path
+
+
+def test_csv(tmp_path):
+    path = write(tmp_path, "points.csv", "x,y,label\n1,2,Orange\n3.5,4,lemon\n5,6, \"Lemon\"\n7,8,0\n9,1,1.0\n")
+    x, y, label, report = read_points(path, "csv", 0, 10)
+    np.testing.assert_array_equal(x, [1, 3.5, 5, 7, 9])
+    np.testing.assert_array_equal(y, [2, 4, 6, 8, 1])
+    np.testing.assert_array_equal(label, [0, 1, 1, 0, 1])
+    assert report == {'read': 5, 'dropped': 0, 'truncated': False}
+
+
+def test_csv_columns_in_any_order(tmp_path):
+    path = write(tmp_path, "points.csv", "label,y,x\nLemon,2,1\n")
+    x, y, label, _ = read_points(path, "csv", 0, 10)
+    assert (x[0], y[0], label[0]) == (1, 2, 1)
+
+
+def test_csv_missing_column(tmp_path):
+    path = write(tmp_path, "points.csv", "x,y\n1,2\n")
+    with pytest.raises(ValueError, match="label"):
+        read_points(path, "csv", 0, 10)
+
+
+def test_bad_rows_are_dropped(tmp_path):
+    path = write(tmp_path, "points.csv", "x,y,label\n1,2,Orange\n,2,Orange\nabc,2,Lemon\n1,2,Lime\n1,2,2\n1,2,0.5\n")
+    x, _, label, report = read_points(path, "csv", 0, 10)
+    assert len(x) == 1
+    assert report == {'read': 6, 'dropped': 5, 'truncated': False}
+
+
+def test_clip(tmp_path):
+    path = write(tmp_path, "points.csv", "x,y,label\n-3,5,Orange\n5,12,Lemon\n5,5,Lemon\n")
+    x, y, _, report = read_points(path, "csv", 0, 10)
+    np.testing.assert_array_equal(x, [0, 5, 5])
+    np.testing.assert_array_equal(y, [5, 10, 5])
+    x, _, _, report = read_points(path, "csv", 0, 10, clip=False)
+    assert len(x) == 1
+    assert report['dropped'] == 2
+
+
+def test_limit_across_chunks(tmp_path):
+    rows = "".join(f"{i % 10},{i % 7},{i % 2}\n" for i in range(25))
+    path = write(tmp_path, "points.csv", "x,y,label\n" + rows)
+    x, _, label, report = read_points(path, "csv", 0, 10, limit=12, chunk_rows=5)
+    assert len(x) == 12
+    np.testing.assert_array_equal(label, np.arange(12) % 2)
+    assert report['truncated']
+    # Stops reading once it has enough
+    assert report['read'] == 15
+    _, _, _, report = read_points(path, "csv", 0, 10, limit=25, chunk_rows=5)
+    assert not report['truncated']
+
+
+def test_json_numeric_labels(tmp_path):
+    # Labels are matched as numbers, so 1.0 is a lemon but 0.5 and -1 aren't anything
+    data = {"x": [1, 2, 3, 4, None], "y": [1, 2, 3, 4, 5], "label": [0, 1.0, 0.5, -1, 1]}
+    path = write(tmp_path, "points.json", json.dumps(data))
+    x, _, label, report = read_points(path, "json", 0, 10)
+    np.testing.assert_array_equal(x, [1, 2])
+    np.testing.assert_array_equal(label, [0, 1])
+    assert report['dropped'] == 3
+
+
+def test_json_names(tmp_path):
+    path = write(tmp_path, "points.json", json.dumps({"x": [1, 2], "y": [3, 4], "label": ["Orange", "LEMON"]}))
+    _, _, label, _ = read_points(path, "json", 0, 10)
+    np.testing.assert_array_equal(label, [0, 1])
+
+
+def test_json_wrong_shape(tmp_path):
+    path = write(tmp_path, "points.json", json.dumps([{"x": 1, "y": 2, "label": "Orange"}]))
+    with pytest.raises(ValueError):
+        read_points(path, "json", 0, 10)
+    path = write(tmp_path, "points.json", json.dumps({"x": [1, 2], "y": [3], "label": [0, 1]}))
+    with pytest.raises(ValueError, match="same length"):
+        read_points(path, "json", 0, 10)
+
+
+def test_empty_file(tmp_path):
+    x, y, label, report = read_points(write(tmp_path, "points.csv", "x,y,label\n"), "csv", 0, 10)
+    assert len(x) == len(y) == len(label) == 0
+    assert report == {'read': 0, 'dropped': 0, 'truncated': False}
+
+
+def test_file_format():
+    assert file_format("Points.CSV") == "csv"
+    with pytest.raises(ValueError):
+        file_format("points.txt")
+
+
+def test_csv_quoted_numbers(tmp_path):
+    path = write(tmp_path, "points.csv", 'x,y,label\n"1.5","2",Orange\n"3",4,"Lemon"\n')
+    x, y, label, report = read_points(path, "csv", 0, 10)
+    np.testing.assert_array_equal(x, [1.5, 3])
+    np.testing.assert_array_equal(y, [2, 4])
+    np.testing.assert_array_equal(label, [0, 1])
+    assert report['dropped'] == 0
+
+
+def test_csv_quoted_numbers_next_to_bad_ones(tmp_path):
+    # A bad number in the chunk mustn't take the quoted good ones down with it
+    path = write(tmp_path, "points.csv", 'x,y,label\n"1.5","2",Orange\n"abc",4,Lemon\n\n 6, "7",Lemon\n')
+    x, y, label, report = read_points(path, "csv", 0, 10)
+    np.testing.assert_array_equal(x, [1.5, 6])
+    np.testing.assert_array_equal(y, [2, 7])
+    np.testing.assert_array_equal(label, [0, 1])
+    assert report == {'read': 3, 'dropped': 1, 'truncated': False}
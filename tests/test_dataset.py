@@ -0,0 +1,82 @@
+import numpy as np
+
+from core import X_AXIS, Y_AXIS, Dataset, SplitIndex
+from dataset import LEMON, ORANGE
+
+
+def assert_index_matches(points):
+    # The SplitIndex should always count the same as building one from scratch
+    fresh = SplitIndex.from_points(points.x, points.y, points.label, n_classes=points.index.n_classes)
+    for axis in (X_AXIS, Y_AXIS):
+        for threshold in (0, 2.5, 5, 7.5, 10):
+            np.testing.assert_array_equal(points.index.count_split(axis, threshold), fresh.count_split(axis, threshold))
+
+
+def test_empty():
+    points = Dataset()
+    assert len(points) == 0
+    assert points.count(ORANGE) == points.count(LEMON) == 0
+    assert not points.pop(ORANGE)
+    assert points.remove(np.zeros(0, dtype=bool)) == 0
+    assert points.clear() == 0
+    assert not points.in_region(0, 10, 0, 10).any()
+    assert len(points.copy()) == 0
+    assert_index_matches(points)
+
+
+def test_one_point():
+    points = Dataset()
+    points.append(2, 3, LEMON)
+    assert len(points) == 1
+    assert (points.count(ORANGE), points.count(LEMON)) == (0, 1)
+    assert not points.pop(ORANGE)
+    assert points.pop(LEMON)
+    assert len(points) == 0
+    assert_index_matches(points)
+
+
+def test_one_class():
+    points = Dataset.from_points([1, 2, 3], [3, 2, 1], [ORANGE] * 3)
+    assert (points.count(ORANGE), points.count(LEMON)) == (3, 0)
+    np.testing.assert_array_equal(points.index.count_split(X_AXIS, 2.5), [[2, 0], [1, 0]])
+
+
+def test_grows_past_capacity():
+    points = Dataset(capacity=2)
+    for i in range(10):
+        points.append(i, 9 - i, i % 2)
+    np.testing.assert_array_equal(points.x, np.arange(10))
+    np.testing.assert_array_equal(points.label, np.arange(10) % 2)
+    assert not points.highlight.any()
+    assert_index_matches(points)
+
+
+def test_pop_removes_the_newest_of_that_class():
+    points = Dataset.from_points([1, 2, 3, 4], [1, 2, 3, 4], [ORANGE, LEMON, ORANGE, LEMON])
+    assert points.pop(ORANGE)
+    np.testing.assert_array_equal(points.x, [1, 2, 4])
+    assert_index_matches(points)
+
+
+def test_extend_remove_and_clear():
+    points = Dataset()
+    points.extend([1, 5, 9], [1, 5, 9], [ORANGE, LEMON, LEMON])
+    assert points.remove(points.in_region(4, 10, 4, 10)) == 2
+    np.testing.assert_array_equal(points.x, [1])
+    assert_index_matches(points)
+    assert points.clear() == 1
+    assert len(points) == 0
+    assert_index_matches(points)
+    # Still usable after being emptied
+    points.append(4, 4, ORANGE)
+    assert points.count(ORANGE) == 1
+
+
+def test_copy_is_independent():
+    points = Dataset.from_points([1, 2], [3, 4], [ORANGE, LEMON])
+    points.highlight[1] = True
+    copy = points.copy()
+    np.testing.assert_array_equal(copy.highlight, [False, True])
+    copy.append(5, 5, ORANGE)
+    assert len(points) == 2
+    assert points.count(ORANGE) == 1
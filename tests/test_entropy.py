@@ -0,0 +1,42 @@
+import itertools
+
+import numpy as np
+
+from core import calculate_entropy, entropies, infogains, table_infogain
+
+
+def entropy(counts):
+    # Straight from the definition, for checking against
+    total = sum(counts)
+    return -sum(n / total * np.log2(n / total) for n in counts if n) if total else 0.0
+
+
+def test_entropies_match_the_definition():
+    counts = np.array(list(itertools.product(range(6), repeat=3)))
+    expected = [entropy(c) for c in counts.tolist()]
+    np.testing.assert_allclose(entropies(counts), expected, atol=1e-12)
+
+
+def test_entropies_match_calculate_entropy():
+    for counts in itertools.product(range(1, 8), repeat=2):
+        assert round(float(entropies(np.array(counts))), 2) == calculate_entropy(*counts)
+
+
+def test_infogains_match_table_infogain():
+    # Every 2x2 table with up to 5 points per cell (and no empty side)
+    tables = np.array([
+        table for table in itertools.product(range(6), repeat=4) if sum(table[:2]) and sum(table[2:])
+    ]).reshape(-1, 2, 2)
+    gains = infogains(tables)
+    for table, gain in zip(tables, gains):
+        side_totals = table.sum(axis=1)
+        expected = entropy(table.sum(axis=0)) - sum(t / side_totals.sum() * entropy(side) for t, side in zip(side_totals, table))
+        assert abs(gain - expected) < 1e-12
+        # table_infogain rounds each step along the way, so it can be a rounding step off
+        assert abs(round(gain, 2) - table_infogain(table)) <= 0.011
+
+
+def test_infogains_keep_leading_axes():
+    tables = np.arange(24).reshape(3, 2, 2, 2)
+    assert infogains(tables).shape == (3, 2)
+    assert entropies(np.zeros((4, 3), dtype=np.int64)).tolist() == [0.0] * 4
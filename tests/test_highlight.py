@@ -0,0 +1,43 @@
+import numpy as np
+
+from highlight import RegionMasks, hover_targets, side_rect
+
+
+def test_side_rect_vertical():
+    # [x0, x1, y0, y1], covering everything left of the split, then everything right of it
+    assert side_rect(0, True, 3, 0, 10) == [0, 3, 10, 0]
+    assert side_rect(1, True, 3, 0, 10) == [10, 3, 10, 0]
+
+
+def test_side_rect_horizontal():
+    assert side_rect(0, False, 4, 0, 10) == [0, 10, 4, 0]
+    assert side_rect(1, False, 4, 0, 10) == [0, 10, 4, 10]
+
+
+def test_region_masks():
+    values = np.array([1, 5, 3, 7, 5])
+    labels = np.array([0, 0, 1, 1, 1])
+    masks = RegionMasks(values, labels, 5, n_classes=2)
+    # Points exactly on the split are on side 1, like in splits.py
+    assert masks.get(side=0).tolist() == [True, False, True, False, False]
+    assert masks.get(side=1).tolist() == [False, True, False, True, True]
+    assert masks.get(label=1).tolist() == [False, False, True, True, True]
+    assert masks.get(label=0, side=1).tolist() == [False, True, False, False, False]
+    assert masks.get().all()
+    # Every class and side together is the same as every point
+    for side in (0, 1):
+        np.testing.assert_array_equal(masks.get(label=0, side=side) | masks.get(label=1, side=side), masks.get(side=side))
+
+
+def test_region_masks_empty():
+    masks = RegionMasks(np.empty(0), np.empty(0, dtype=np.int64), 5, n_classes=2)
+    assert masks.get(label=1, side=0).shape == (0,)
+
+
+def test_hover_targets():
+    targets = hover_targets(["oranges", "lemons"], True, 3, 0, 10)
+    assert targets["btn_side1"] == {'label': None, 'side': 0, 'points': True, 'rect': [0, 10, 10, 0]}
+    assert targets["btn_X_side2"] == {'label': None, 'side': 1, 'points': False, 'rect': side_rect(1, True, 3, 0, 10)}
+    assert targets["btn_lemons_side1"] == {'label': 1, 'side': 0, 'points': True, 'rect': side_rect(0, True, 3, 0, 10)}
+    assert targets["btn_all_oranges"]['label'] == 0
+    assert len(targets) == 4 + 2 * 3
@@ -0,0 +1,68 @@
+import asyncio
+
+from shiny import reactive
+
+from ratelimit import debounce, throttle
+
+# The delays are short to keep the tests quick, but long enough that sending a few
+# values in a row happens well within one of them
+DELAY = 0.2
+
+
+def run(limiter, steps):
+    # Follow a reactive.value through limiter(DELAY, value.get), setting it to each of
+    # steps' values in turn and waiting their number of seconds after each one
+    # Returns every value the limited calc updated to, with when it did (since the first step)
+    async def main():
+        value = reactive.value(steps[0][0])
+        limited = limiter(DELAY, value.get)
+        seen = []
+        start = asyncio.get_running_loop().time()
+
+        @reactive.effect
+        def _record():
+            seen.append((limited(), asyncio.get_running_loop().time() - start))
+
+        for new_value, wait in steps:
+            value.set(new_value)
+            await reactive.flush()
+            await asyncio.sleep(wait)
+        _record.destroy()
+        return seen
+
+    return asyncio.run(main())
+
+
+def values(seen):
+    return [value for value, _ in seen]
+
+
+def test_debounce_waits_for_the_last_change():
+    seen = run(debounce, [(1, 0.5), (2, 0.02), (3, 0.02), (4, 0.5)])
+    # 2 and 3 were replaced before the delay was up, so they're skipped
+    assert values(seen) == [1, 4]
+    assert seen[1][1] >= 0.54 + DELAY - 0.02
+
+
+def test_debounce_keeps_waiting_while_changes_keep_coming():
+    steps = [(0, 0.5)] + [(i, DELAY / 2) for i in range(1, 6)] + [(6, 0.5)]
+    seen = run(debounce, steps)
+    assert values(seen) == [0, 6]
+
+
+def test_throttle_updates_while_changing_and_ends_on_the_last_value():
+    steps = [(0, 0.5)] + [(i, DELAY / 4) for i in range(1, 13)] + [(13, 0.5)]
+    seen = run(throttle, steps)
+    assert values(seen)[0] == 0
+    assert values(seen)[-1] == 13
+    # Updates in between while the value keeps changing, but nowhere near every one
+    assert 3 <= len(seen) <= 7
+    times = [t for _, t in seen]
+    assert all(later - earlier >= DELAY - 0.02 for earlier, later in zip(times[1:], times[2:]))
+
+
+def test_throttle_lets_a_single_change_straight_through():
+    seen = run(throttle, [(0, 0.5), (1, 0.5)])
+    assert values(seen) == [0, 1]
+    # (without waiting out the delay first)
+    assert seen[1][1] < 0.5 + DELAY * 0.9
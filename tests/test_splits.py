@@ -0,0 +1,92 @@
+import numpy as np
+
+from core import X_AXIS, Y_AXIS, SplitIndex, best_splits, count_split, count_splits
+
+
+def points(x, y, labels):
+    return np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64), np.asarray(labels, dtype=np.int64)
+
+
+def test_best_split_separates_the_classes():
+    # Oranges on the left, lemons on the right, mixed up and down
+    x, y, labels = points([1, 2, 8, 9], [1, 9, 1, 9], [0, 0, 1, 1])
+    best = best_splits(x, y, labels)[0]
+    assert best['axis'] == X_AXIS
+    assert best['threshold'] == 5.0
+    assert best['infogain'] == 1.0
+    np.testing.assert_array_equal(best['table'], [[2, 0], [0, 2]])
+
+
+def test_best_splits_are_best_first_and_match_count_split():
+    x, y, labels = points([1, 2, 3, 8, 9], [5, 1, 9, 2, 7], [0, 0, 1, 1, 1])
+    splits = best_splits(x, y, labels, k=10)
+    gains = [split['infogain'] for split in splits]
+    assert gains == sorted(gains, reverse=True)
+    for split in splits:
+        values = x if split['axis'] == X_AXIS else y
+        np.testing.assert_array_equal(split['table'], count_split(values, labels, split['threshold']))
+
+
+def test_best_splits_k():
+    x, y, labels = points([1, 2, 3, 4], [4, 3, 2, 1], [0, 1, 0, 1])
+    assert len(best_splits(x, y, labels, k=2)) == 2
+    # Only 3 thresholds between 4 distinct values on each axis
+    assert len(best_splits(x, y, labels, k=100)) == 6
+
+
+def test_best_splits_empty():
+    assert best_splits(*points([], [], [])) == []
+
+
+def test_best_splits_one_point():
+    assert best_splits(*points([3], [4], [1])) == []
+
+
+def test_best_splits_same_spot():
+    # Points on top of each other can't be split apart
+    assert best_splits(*points([3, 3], [4, 4], [0, 1])) == []
+
+
+def test_best_splits_one_class():
+    splits = best_splits(*points([1, 2, 3], [3, 1, 2], [1, 1, 1]))
+    assert {split['axis'] for split in splits} == {X_AXIS, Y_AXIS}
+    assert all(split['infogain'] == 0 for split in splits)
+
+
+def test_split_index_insert_and_remove():
+    rng = np.random.default_rng(0)
+    x, y, labels = points(rng.integers(0, 10, 50), rng.integers(0, 10, 50), rng.integers(0, 2, 50))
+    index = SplitIndex()
+    for i in range(len(x)):
+        index.insert(x[i], y[i], labels[i])
+    # Take out every other point again (duplicate values included)
+    for i in range(0, len(x), 2):
+        index.remove(x[i], y[i], labels[i])
+    kept = np.arange(len(x)) % 2 == 1
+    thresholds = np.arange(0, 10.5, 0.5)
+    for axis, values in ((X_AXIS, x), (Y_AXIS, y)):
+        np.testing.assert_array_equal(
+            index.count_splits(axis, thresholds), count_splits(values[kept], labels[kept], thresholds)
+        )
+        for threshold in (0, 4.5, 5, 10):
+            np.testing.assert_array_equal(
+                index.count_split(axis, threshold), count_split(values[kept], labels[kept], threshold)
+            )
+    assert [index.count(label) for label in (0, 1)] == np.bincount(labels[kept], minlength=2).tolist()
+
+
+def test_split_index_insert_many_matches_from_points():
+    x, y, labels = points([3, 1, 2, 3], [1, 1, 2, 2], [0, 1, 0, 1])
+    index = SplitIndex.from_points(x[:2], y[:2], labels[:2])
+    index.insert_many(x[2:], y[2:], labels[2:])
+    fresh = SplitIndex.from_points(x, y, labels)
+    for axis in (X_AXIS, Y_AXIS):
+        np.testing.assert_array_equal(index.count_splits(axis, [0, 1.5, 2, 3.5]), fresh.count_splits(axis, [0, 1.5, 2, 3.5]))
+
+
+def test_split_index_remove_to_empty():
+    index = SplitIndex()
+    index.insert(2.0, 3.0, 1)
+    index.remove(2.0, 3.0, 1)
+    assert index.count(1) == 0
+    np.testing.assert_array_equal(index.count_split(X_AXIS, 5), [[0, 0], [0, 0]])
@@ -0,0 +1,52 @@
+import pytest
+
+from texhtml import render_inline_math, tex_to_html
+
+
+def test_fraction_and_log():
+    assert tex_to_html(r"\frac{3}{5}\log_{2} 5") == (
+        '<span class="tex"><span class="tex-frac"><span class="tex-num">3</span><span class="tex-den">5</span></span>'
+        '<span class="tex-fn">log</span><sub>2</sub>5</span>'
+    )
+
+
+def test_variables_and_operators():
+    # Letters are italic, and - becomes a real minus sign
+    assert tex_to_html("H(Y) - a") == (
+        '<span class="tex"><i>H</i>(<i>Y</i>)<span class="tex-op">−</span><i>a</i></span>'
+    )
+    assert tex_to_html(r"1 \cdot 2 \approx 2") == (
+        '<span class="tex">1<span class="tex-op">·</span>2<span class="tex-op">≈</span>2</span>'
+    )
+
+
+def test_nested_groups():
+    assert tex_to_html(r"\frac{\frac{1}{2}}{x_{1}}") == (
+        '<span class="tex"><span class="tex-frac"><span class="tex-num"><span class="tex-frac">'
+        '<span class="tex-num">1</span><span class="tex-den">2</span></span></span>'
+        '<span class="tex-den"><i>x</i><sub>1</sub></span></span></span>'
+    )
+
+
+def test_template_fields_pass_through():
+    # So templates can be converted before their numbers are filled in
+    assert tex_to_html(r"\frac{$count0}{$total}") == (
+        '<span class="tex"><span class="tex-frac"><span class="tex-num">$count0</span>'
+        '<span class="tex-den">$total</span></span></span>'
+    )
+
+
+def test_html_is_escaped():
+    assert tex_to_html("a < b") == '<span class="tex"><i>a</i>&lt;<i>b</i></span>'
+
+
+def test_unbalanced_braces():
+    with pytest.raises(ValueError, match="Unbalanced"):
+        tex_to_html(r"\frac{1}{2")
+
+
+def test_render_inline_math():
+    assert render_inline_math(r"<p>Gain \(x_{1}\) here</p>") == (
+        '<p>Gain <span class="tex"><i>x</i><sub>1</sub></span> here</p>'
+    )
+    assert render_inline_math("<p>No maths</p>") == "<p>No maths</p>"
@@ -0,0 +1,80 @@
+import numpy as np
+
+from core import LEAF, X_AXIS, Y_AXIS, fit_tree
+
+
+def test_fit_tree_splits_both_axes():
+    # Lemons only in the top right corner, so it takes two splits to separate them
+    x = [1, 2, 8, 9, 1, 2, 8, 9]
+    y = [1, 2, 1, 2, 8, 9, 8, 9]
+    labels = [0, 0, 0, 0, 0, 0, 1, 1]
+    tree = fit_tree(x, y, labels)
+    assert len(tree) == 5
+    assert {int(a) for a in tree.axis if a != LEAF} == {X_AXIS, Y_AXIS}
+    np.testing.assert_array_equal(tree.predict(x, y), labels)
+
+
+def test_predict_grid():
+    tree = fit_tree([1, 2, 8, 9], [1, 9, 1, 9], [0, 0, 1, 1])
+    grid = tree.predict_grid(0, 10, 4)
+    # Rows are y and columns are x, and the split is at x = 5
+    np.testing.assert_array_equal(grid, [[0, 0, 1, 1]] * 4)
+    assert grid.dtype == np.int8
+
+
+def test_max_depth():
+    rng = np.random.default_rng(0)
+    x, y = rng.uniform(0, 10, (2, 200))
+    labels = rng.integers(0, 2, 200)
+    assert fit_tree(x, y, labels, max_depth=2).max_depth <= 2
+    assert len(fit_tree(x, y, labels, max_depth=0)) == 1
+
+
+def test_one_class_is_a_single_leaf():
+    tree = fit_tree([1, 5, 9], [2, 6, 3], [1, 1, 1])
+    assert len(tree) == 1
+    assert tree.predict_grid(0, 10, 5).shape == (5, 5)
+    assert (tree.predict_grid(0, 10, 5) == 1).all()
+
+
+def test_one_point():
+    tree = fit_tree([5], [5], [0])
+    assert len(tree) == 1
+    np.testing.assert_array_equal(tree.counts, [[1, 0]])
+    assert tree.predict_grid(0, 10, 3).shape == (3, 3)
+
+
+def test_empty():
+    tree = fit_tree([], [], np.empty(0, dtype=np.int64))
+    assert len(tree) == 1
+    assert tree.predict_grid(0, 10, 5).shape == (5, 5)
+    assert tree.predict([1, 2], [3, 4]).shape == (2,)
+
+
+def test_rules():
+    tree = fit_tree([1, 2, 8], [1, 9, 1], [0, 0, 1])
+    assert tree.rules(["width", "height"]) == [
+        "if width < 5:",
+        "    Orange (2 oranges, 0 lemons)",
+        "else:",
+        "    Lemon (0 oranges, 1 lemon)",
+    ]
+    # Plurals come from the classes, not from adding an s
+    classes = [{"name": "Mouse", "plural": "Mice"}, {"name": "Fish", "plural": "Fish"}]
+    assert tree.rules(["x", "y"], classes)[1] == "    Mouse (2 mice, 0 fish)"
+
+
+def test_leaf_boxes():
+    # Oranges on the left, and on the right oranges below lemons
+    tree = fit_tree([1, 9, 1, 9, 2, 8], [1, 1, 9, 9, 8, 8], [0, 0, 0, 1, 0, 1])
+    boxes = tree.leaf_boxes(0, 10)
+    assert len(boxes) == 3
+    assert sorted(boxes) == [(0, 5.0, 0, 10, 0), (5.0, 10, 0, 4.5, 0), (5.0, 10, 4.5, 10, 1)]
+    # The boxes cover the plane between them, and each agrees with predict()
+    assert sum((x1 - x0) * (y1 - y0) for x0, x1, y0, y1, _ in boxes) == 100
+    for x0, x1, y0, y1, label in boxes:
+        assert tree.predict([(x0 + x1) / 2], [(y0 + y1) / 2])[0] == label
+
+
+def test_leaf_boxes_single_leaf():
+    assert fit_tree([], [], np.empty(0, dtype=np.int64)).leaf_boxes(0, 10) == [(0, 10, 0, 10, 0)]
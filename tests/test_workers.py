@@ -0,0 +1,42 @@
+from workers import WORKER_COOKIE, Dispatcher, header_values, wants_websocket
+
+
+def head(*headers):
+    return b"\r\n".join((b"GET /websocket/ HTTP/1.1",) + headers) + b"\r\n\r\n"
+
+
+def test_header_values():
+    request = head(b"Host: localhost", b"cookie:a=1", b"Cookie: b=2 ")
+    assert header_values(request, b"cookie") == ["a=1", "b=2"]
+    assert header_values(request, b"upgrade") == []
+
+
+def test_wants_websocket():
+    assert wants_websocket(head(b"Upgrade: websocket"))
+    assert wants_websocket(head(b"Upgrade:websocket"))
+    assert wants_websocket(head(b"upgrade: WebSocket, foo"))
+    assert wants_websocket(head(b"UPGRADE: h2c,  websocket"))
+    assert not wants_websocket(head(b"Upgrade: h2c"))
+    assert not wants_websocket(head(b"X-Upgrade: websocket"))
+    assert not wants_websocket(head(b"Host: localhost"))
+
+
+class FakeWorker:
+    def __init__(self, index, sessions=0, running=True):
+        self.index = index
+        self.sessions = sessions
+        self.is_running = running
+
+    def running(self):
+        return self.is_running
+
+
+def test_choose():
+    workers = [FakeWorker(0, sessions=2), FakeWorker(1), FakeWorker(2, running=False)]
+    dispatcher = Dispatcher(workers)
+    # Sticks to the worker in the cookie
+    assert dispatcher.choose(head(f"Cookie: x=1; {WORKER_COOKIE}=0".encode())) == (workers[0], False)
+    # Otherwise (or if that worker is down) the least busy one, and the browser is told
+    assert dispatcher.choose(head()) == (workers[1], True)
+    assert dispatcher.choose(head(f"Cookie: {WORKER_COOKIE}=2".encode())) == (workers[1], True)
+    assert dispatcher.choose(head(f"Cookie: {WORKER_COOKIE}=9".encode())) == (workers[1], True)
@@ -0,0 +1,96 @@
+import re
+from functools import lru_cache
+from html import escape
+
+# A tiny TeX to HTML converter for the handful of things the equations use
+# (\frac, \log_{2}, \approx, \cdot, letters, numbers and operators), so they
+# can be sent to the browser already laid out instead of being typeset by MathJax.
+# The fractions are styled by the .tex-* classes in the page header in app.py.
+# string.Template fields like $h_y are passed through untouched, so templates
+# can be converted before their numbers are filled in.
+
+SYMBOLS = {
+    "\\approx": "≈",
+    "\\cdot": "·",
+}
+OPERATORS = {"=": "=", "+": "+", "-": "−", "≈": "≈", "·": "·"}
+FUNCTIONS = {"\\log": "log"}
+
+_TOKEN = re.compile(r"\$[_a-zA-Z][_a-zA-Z0-9]*|\\[a-zA-Z]+|[0-9.]+|\s+|.")
+
+
+def _tokens(tex):
+    return _TOKEN.findall(tex)
+
+
+def _group(tokens, i):
+    # The argument starting at tokens[i]: a {...} group or a single token
+    # Returns (its tokens, index after it)
+    if tokens[i] != "{":
+        return [tokens[i]], i + 1
+    depth = 0
+    for j in range(i, len(tokens)):
+        if tokens[j] == "{":
+            depth += 1
+        elif tokens[j] == "}":
+            depth -= 1
+            if depth == 0:
+                return tokens[i + 1:j], j + 1
+    raise ValueError("Unbalanced braces in TeX: " + "".join(tokens))
+
+
+def _skip_space(tokens, i):
+    while i < len(tokens) and tokens[i].isspace():
+        i += 1
+    return i
+
+
+def _render(tokens):
+    html = []
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        i += 1
+        if token.isspace():
+            # Spacing in TeX math comes from the symbols, not the source
+            continue
+        if token.startswith("$"):
+            # Template field, filled in later
+            html.append(token)
+        elif token == "\\frac":
+            numerator, i = _group(tokens, _skip_space(tokens, i))
+            denominator, i = _group(tokens, _skip_space(tokens, i))
+            html.append(
+                f'<span class="tex-frac"><span class="tex-num">{_render(numerator)}</span>'
+                f'<span class="tex-den">{_render(denominator)}</span></span>'
+            )
+        elif token in ("_", "^"):
+            argument, i = _group(tokens, _skip_space(tokens, i))
+            tag = "sub" if token == "_" else "sup"
+            html.append(f"<{tag}>{_render(argument)}</{tag}>")
+        elif token in FUNCTIONS:
+            html.append(f'<span class="tex-fn">{FUNCTIONS[token]}</span>')
+        elif token in SYMBOLS or token in OPERATORS:
+            symbol = SYMBOLS.get(token, token)
+            html.append(f'<span class="tex-op">{OPERATORS[symbol]}</span>')
+        elif token == "{" or token == "}":
+            continue
+        elif token.isalpha():
+            # Variables are in italics
+            html.append(f"<i>{escape(token)}</i>")
+        else:
+            html.append(escape(token))
+    return "".join(html)
+
+
+# Memoised on the TeX source, so each distinct piece of an equation is only converted once
+@lru_cache(maxsize=1024)
+def tex_to_html(tex):
+    return f'<span class="tex">{_render(_tokens(tex))}</span>'
+
+
+_INLINE_MATH = re.compile(r"\\\((.*?)\\\)", re.DOTALL)
+
+def render_inline_math(html):
+    # Replace every \( ... \) in some HTML with its converted version
+    return _INLINE_MATH.sub(lambda match: tex_to_html(match.group(1)), html)
@@ -0,0 +1,183 @@
+import numpy as np
+
+from dataset import CLASSES
+from entropy import infogains
+from splits import X_AXIS, Y_AXIS, candidate_splits
+
+# Value of DecisionTree.axis for nodes that don't split (leaves)
+LEAF = -1
+
+
+class DecisionTree:
+    """
+    A fitted decision tree, stored as flat arrays with one entry per node
+    (node 0 is the root) instead of a tree of node objects:
+        axis[i]       axis node i splits on (X_AXIS/Y_AXIS), or LEAF
+        threshold[i]  points with value < threshold[i] go to left[i], the rest to right[i]
+        counts[i]     how many training points of each class reached node i
+        depth[i]      how far node i is from the root
+    """
+
+    def __init__(self, axis, threshold, left, right, counts, depth):
+        self.axis = np.asarray(axis, dtype=np.int8)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.depth = np.asarray(depth, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.axis)
+
+    @property
+    def prediction(self):
+        # Majority class at each node (ties go to the lower label)
+        return self.counts.argmax(axis=1)
+
+    @property
+    def max_depth(self):
+        return int(self.depth.max())
+
+    def apply(self, x, y):
+        # Leaf node each point (x[i], y[i]) ends up in
+        # Every point takes one step down the tree at a time, so this is one
+        # vectorised pass per level instead of a walk per point
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        # Broadcast, so a grid (a row of x by a column of y) gets a node per cell
+        # even when the tree is a single leaf and the loop below never runs
+        node = np.zeros(np.broadcast(x, y).shape, dtype=np.int32)
+        for _ in range(self.max_depth):
+            axis = self.axis[node]
+            at_leaf = axis == LEAF
+            if at_leaf.all():
+                break
+            values = np.where(axis == X_AXIS, x, y)
+            child = np.where(values < self.threshold[node], self.left[node], self.right[node])
+            node = np.where(at_leaf, node, child)
+        return node
+
+    def predict(self, x, y):
+        return self.prediction[self.apply(x, y)]
+
+    def predict_grid(self, lo, hi, resolution):
+        # Predicted class at the centre of every cell of a resolution x resolution
+        # grid covering [lo, hi] on both axes, as grid[row (y), column (x)]
+        step = (hi - lo) / resolution
+        centres = lo + step * (np.arange(resolution) + 0.5)
+        # Splits are axis-aligned, so the leaf only depends on which side of
+        # each threshold a cell is, and the grid can be broadcast instead of
+        # building resolution^2 coordinate pairs up front
+        return self.predict(centres[np.newaxis, :], centres[:, np.newaxis]).astype(np.int8)
+
+    def leaf_boxes(self, lo, hi):
+        # The rectangle of [lo, hi] x [lo, hi] that each leaf covers, as a list of
+        # (x0, x1, y0, y1, predicted class). The splits are axis-aligned, so every
+        # leaf is exactly one rectangle, and drawing the leaves takes one shape each
+        # however fine a grid it would take to draw them cell by cell
+        boxes = []
+        stack = [(0, lo, hi, lo, hi)]
+        while stack:
+            node, x0, x1, y0, y1 = stack.pop()
+            if self.axis[node] == LEAF:
+                boxes.append((x0, x1, y0, y1, int(self.prediction[node])))
+                continue
+            if self.axis[node] == X_AXIS:
+                split = min(max(float(self.threshold[node]), x0), x1)
+                below, above = (x0, split, y0, y1), (split, x1, y0, y1)
+            else:
+                split = min(max(float(self.threshold[node]), y0), y1)
+                below, above = (x0, x1, y0, split), (x0, x1, split, y1)
+            # Pushed in reverse so the left/lower side comes out first
+            stack.append((self.right[node], *above))
+            stack.append((self.left[node], *below))
+        return boxes
+
+    def rules(self, axis_names, classes=CLASSES):
+        # The tree written out as nested if/else lines, for showing to students
+        # (classes are in the same form as dataset.CLASSES)
+        lines = []
+        # Depth-first, each entry is (node number or a line of text, indent level)
+        stack = [(0, 0)]
+        while stack:
+            item, indent = stack.pop()
+            pad = "    " * indent
+            if isinstance(item, str):
+                lines.append(pad + item)
+            elif self.axis[item] == LEAF:
+                counts = ", ".join(
+                    f"{n} {(cls['name'] if n == 1 else cls['plural']).lower()}" for n, cls in zip(self.counts[item], classes)
+                )
+                lines.append(f"{pad}{classes[self.prediction[item]]['name']} ({counts})")
+            else:
+                condition = f"{axis_names[self.axis[item]]} < {self.threshold[item]:g}"
+                # Pushed in reverse so they come back out in order
+                stack.append((self.right[item], indent + 1))
+                stack.append(("else:", indent))
+                stack.append((self.left[item], indent + 1))
+                stack.append((f"if {condition}:", indent))
+        return lines
+
+
+def _best_split(x, y, labels, n_classes, min_samples_leaf):
+    # Best (gain, axis, threshold) for the points at one node, or None if
+    # there's no split that leaves at least min_samples_leaf points on each side
+    best = None
+    for axis, values in ((X_AXIS, x), (Y_AXIS, y)):
+        thresholds, tables = candidate_splits(values, labels, n_classes)
+        side_totals = tables.sum(axis=2)
+        allowed = (side_totals >= min_samples_leaf).all(axis=1)
+        if not allowed.any():
+            continue
+        gains = np.where(allowed, infogains(tables), -np.inf)
+        i = int(np.argmax(gains))
+        if best is None or gains[i] > best[0]:
+            best = (float(gains[i]), axis, float(thresholds[i]))
+    return best
+
+
+def fit_tree(x, y, labels, n_classes=2, max_depth=3, min_samples_leaf=1, min_gain=0.0):
+    # Grow a tree greedily, picking the split with the highest information gain
+    # at each node (the same search as splits.best_splits).
+    # A node becomes a leaf when it's at max_depth, when no split leaves
+    # min_samples_leaf points on both sides, or when the best gain isn't more than min_gain.
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    labels = np.asarray(labels)
+    axis, threshold, left, right, counts, depth = [], [], [], [], [], []
+
+    def add_node(idx, node_depth):
+        axis.append(LEAF)
+        threshold.append(0.0)
+        left.append(-1)
+        right.append(-1)
+        counts.append(np.bincount(labels[idx], minlength=n_classes))
+        depth.append(node_depth)
+        return len(axis) - 1
+
+    # Nodes still to be split, as (node, indices of its points)
+    root_idx = np.arange(len(labels))
+    stack = [(add_node(root_idx, 0), root_idx)]
+    while stack:
+        node, idx = stack.pop()
+        if depth[node] >= max_depth or len(idx) < 2 * min_samples_leaf:
+            continue
+        node_labels = labels[idx]
+        # Already pure, nothing to gain
+        if np.count_nonzero(counts[node]) <= 1:
+            continue
+        best = _best_split(x[idx], y[idx], node_labels, n_classes, min_samples_leaf)
+        if best is None or best[0] <= min_gain:
+            continue
+        _, best_axis, best_threshold = best
+        values = x[idx] if best_axis == X_AXIS else y[idx]
+        below = values < best_threshold
+        left_idx, right_idx = idx[below], idx[~below]
+        axis[node] = best_axis
+        threshold[node] = best_threshold
+        left[node] = add_node(left_idx, depth[node] + 1)
+        right[node] = add_node(right_idx, depth[node] + 1)
+        stack.append((right[node], right_idx))
+        stack.append((left[node], left_idx))
+
+    return DecisionTree(axis, threshold, left, right, np.array(counts).reshape(-1, n_classes), depth)
@@ -0,0 +1,243 @@
+# Runs several copies of the app (serve.py) as separate processes behind one address,
+# so a big class can use every core instead of one:
+#     python workers.py --workers 4 --port 8000
+# Each session lives entirely in one worker's memory (its datapoints, its websocket,
+# its uploads and downloads), so the dispatcher in front sends every request from the
+# same browser to the same worker. The first response a browser gets sets a WORKER_COOKIE
+# saying which worker that is, and everything after that (including the websocket, which
+# the browser sends the cookie with) goes there. New browsers go to whichever worker has
+# the fewest sessions open. Workers that crash are started again.
+# (uvicorn's own --workers can't be used for this: it hands each connection to any
+# worker, so e.g. an upload could land on a worker that doesn't have the session)
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+WORKER_COOKIE = "dt_worker"
+# Longest request/response head (request line or status line plus headers) accepted
+MAX_HEAD = 64 * 1024
+BAD_GATEWAY = (
+    b"HTTP/1.1 502 Bad Gateway\r\nContent-Type: text/plain\r\nContent-Length: 28\r\n"
+    b"Connection: close\r\n\r\nNo workers are available yet"
+)
+
+
+class Worker:
+    """
+    One copy of the app, running in its own process on its own port.
+    """
+
+    def __init__(self, index, port):
+        self.index = index
+        self.port = port
+        self.process = None
+        # Websockets (i.e. sessions) currently open through the dispatcher
+        self.sessions = 0
+
+    def start(self):
+        # WORKER_INDEX lets each worker tell itself apart (see METRICS_PORT in app.py)
+        env = dict(os.environ, WORKER_INDEX=str(self.index))
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "shiny", "run", "serve.py", "--host", "127.0.0.1", "--port", str(self.port)],
+            cwd=ROOT, env=env,
+        )
+
+    def running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self):
+        if self.running():
+            self.process.terminate()
+
+    def wait(self, timeout=10):
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+class Dispatcher:
+    """
+    A small HTTP (and websocket) proxy that sends each browser to the same worker every time.
+    Only the head of the first request and response on a connection is read (to pick the
+    worker and set the cookie), everything after that is passed through as it is.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.next = 0
+        # Both ends of every connection being passed through, so they can be closed on shutdown
+        self.open = set()
+
+    def choose(self, head):
+        # The worker named in the request's cookie, or the least busy one (taking
+        # turns between equally busy ones) if there isn't one or it's down
+        # Returns the worker and whether the browser needs to be told about it
+        worker = None
+        for value in header_values(head, b"cookie"):
+            for cookie in value.split(";"):
+                key, _, number = cookie.strip().partition("=")
+                if key == WORKER_COOKIE and number.isdigit() and int(number) < len(self.workers):
+                    worker = self.workers[int(number)]
+        if worker is not None and worker.running():
+            return worker, False
+        running = [w for w in self.workers if w.running()]
+        if not running:
+            return None, True
+        self.next += 1
+        worker = min(running, key=lambda w: (w.sessions, (w.index - self.next) % len(self.workers)))
+        return worker, True
+
+    async def handle(self, client_reader, client_writer):
+        upstream_writer = None
+        to_upstream = None
+        worker = None
+        is_websocket = False
+        self.open.add(client_writer)
+        try:
+            head = await client_reader.readuntil(b"\r\n\r\n")
+            worker, set_cookie = self.choose(head)
+            try:
+                if worker is None:
+                    raise ConnectionError
+                upstream_reader, upstream_writer = await asyncio.open_connection("127.0.0.1", worker.port, limit=MAX_HEAD)
+                self.open.add(upstream_writer)
+            except OSError:
+                # Still starting up (or restarting)
+                client_writer.write(BAD_GATEWAY)
+                await client_writer.drain()
+                return
+            is_websocket = wants_websocket(head)
+            if is_websocket:
+                worker.sessions += 1
+            upstream_writer.write(head)
+            # The request's body (e.g. an upload) has to keep going while waiting for the response
+            to_upstream = asyncio.create_task(pipe(client_reader, upstream_writer))
+            response = await upstream_reader.readuntil(b"\r\n\r\n")
+            if set_cookie:
+                cookie = f"Set-Cookie: {WORKER_COOKIE}={worker.index}; Path=/; HttpOnly; SameSite=Lax\r\n"
+                response = response[:-2] + cookie.encode() + b"\r\n"
+            client_writer.write(response)
+            # Once the worker's done with the connection, so is the browser
+            await pipe(upstream_reader, client_writer)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            if to_upstream is not None:
+                to_upstream.cancel()
+            if is_websocket:
+                worker.sessions -= 1
+            for writer in (client_writer, upstream_writer):
+                if writer is not None:
+                    writer.close()
+                    self.open.discard(writer)
+
+    def close_all(self):
+        # Drop every connection (the handlers then finish on their own)
+        for writer in list(self.open):
+            writer.close()
+
+
+def header_values(head, name):
+    # The value of every header called name (lowercase bytes, e.g. b"cookie") in a request head
+    values = []
+    for line in head.split(b"\r\n")[1:]:
+        key, _, value = line.partition(b":")
+        if key.strip().lower() == name:
+            values.append(value.decode("latin-1").strip())
+    return values
+
+
+def wants_websocket(head):
+    # Whether a request asks to be upgraded to a websocket (Upgrade is a comma-separated
+    # list of protocols, in any case, e.g. "Upgrade: WebSocket" or "Upgrade:websocket, h2c")
+    return any(
+        protocol.strip().lower() == "websocket"
+        for value in header_values(head, b"upgrade")
+        for protocol in value.split(",")
+    )
+
+
+async def pipe(reader, writer):
+    # Copy everything from reader to writer until reader's side closes
+    try:
+        while data := await reader.read(65536):
+            writer.write(data)
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        if writer.can_write_eof() and not writer.is_closing():
+            try:
+                writer.write_eof()
+            except OSError:
+                pass
+
+
+async def supervise(workers, stopping):
+    # Start any worker that's stopped (all of them at first)
+    while not stopping.is_set():
+        for worker in workers:
+            if not worker.running():
+                if worker.process is not None:
+                    print(f"Worker {worker.index} exited with {worker.process.returncode}, restarting it", flush=True)
+                    # Don't restart in a tight loop if it's failing straight away
+                    worker.process = None
+                    await asyncio.sleep(1)
+                worker.start()
+        try:
+            await asyncio.wait_for(stopping.wait(), 1)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def serve(args):
+    workers = [Worker(i, args.worker_port + i) for i in range(args.workers)]
+    dispatcher = Dispatcher(workers)
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+    supervisor = asyncio.create_task(supervise(workers, stopping))
+    server = await asyncio.start_server(dispatcher.handle, args.host, args.port, limit=MAX_HEAD)
+    ports = f"{workers[0].port}-{workers[-1].port}" if len(workers) > 1 else workers[0].port
+    print(f"Dispatching http://{args.host}:{args.port} to {len(workers)} worker(s) on ports {ports}", flush=True)
+    try:
+        await stopping.wait()
+    finally:
+        # Stop taking connections, and close the open ones so the workers can shut down
+        server.close()
+        dispatcher.close_all()
+        try:
+            await asyncio.wait_for(server.wait_closed(), 5)
+        except asyncio.TimeoutError:
+            pass
+        await supervisor
+        for worker in workers:
+            worker.stop()
+        deadline = time.monotonic() + 10
+        for worker in workers:
+            if worker.process is not None:
+                worker.wait(max(0, deadline - time.monotonic()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the app as several worker processes behind one address.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes to run (default: one per core)")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (0.0.0.0 for every interface)")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--worker-port", type=int, default=8001,
+                        help="port of the first worker, the rest get the ones after it")
+    args = parser.parse_args()
+    asyncio.run(serve(args))
+
+
+if __name__ == "__main__":
+    main()
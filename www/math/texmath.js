@@ -0,0 +1,99 @@
+// A small math renderer for the equations in the Calculations card, served by the app
+// itself instead of loading all of MathJax from a CDN.
+// It only knows the TeX the equations use (\frac, \log_{2}, \approx, \cdot, letters,
+// numbers and operators) and lays it out the same way as texhtml.py does on the server,
+// using the .tex-* styles from the page header in app.py.
+(function() {
+    var SYMBOLS = {"\\approx": "≈", "\\cdot": "·"};
+    var OPERATORS = {"=": "=", "+": "+", "-": "−", "≈": "≈", "·": "·"};
+    var FUNCTIONS = {"\\log": "log"};
+    var TOKEN = /\\[a-zA-Z]+|[0-9.]+|\s+|[\s\S]/g;
+    var INLINE_MATH = /\\\(([\s\S]*?)\\\)/g;
+
+    function escapeHtml(text) {
+        return text.replace(/&/g, "&amp;").replace(/</g, "&lt;").replace(/>/g, "&gt;");
+    }
+
+    // The argument starting at tokens[i]: a {...} group or a single token
+    function group(tokens, i) {
+        while (i < tokens.length && /^\s+$/.test(tokens[i])) {
+            i++;
+        }
+        if (tokens[i] !== "{") {
+            return {tokens: tokens.slice(i, i + 1), next: i + 1};
+        }
+        var depth = 0;
+        for (var j = i; j < tokens.length; j++) {
+            if (tokens[j] === "{") {
+                depth++;
+            } else if (tokens[j] === "}" && --depth === 0) {
+                return {tokens: tokens.slice(i + 1, j), next: j + 1};
+            }
+        }
+        return {tokens: tokens.slice(i + 1), next: tokens.length};
+    }
+
+    function render(tokens) {
+        var html = "";
+        var i = 0;
+        while (i < tokens.length) {
+            var token = tokens[i++];
+            var arg;
+            if (/^\s+$/.test(token) || token === "{" || token === "}") {
+                continue;
+            } else if (token === "\\frac") {
+                var numerator = group(tokens, i);
+                var denominator = group(tokens, numerator.next);
+                i = denominator.next;
+                html += '<span class="tex-frac"><span class="tex-num">' + render(numerator.tokens) +
+                    '</span><span class="tex-den">' + render(denominator.tokens) + '</span></span>';
+            } else if (token === "_" || token === "^") {
+                arg = group(tokens, i);
+                i = arg.next;
+                var tag = token === "_" ? "sub" : "sup";
+                html += "<" + tag + ">" + render(arg.tokens) + "</" + tag + ">";
+            } else if (token in FUNCTIONS) {
+                html += '<span class="tex-fn">' + FUNCTIONS[token] + "</span>";
+            } else if (token in SYMBOLS || token in OPERATORS) {
+                html += '<span class="tex-op">' + OPERATORS[SYMBOLS[token] || token] + "</span>";
+            } else if (/^[a-zA-Z]$/.test(token)) {
+                // Variables are in italics
+                html += "<i>" + token + "</i>";
+            } else {
+                html += escapeHtml(token);
+            }
+        }
+        return html;
+    }
+
+    function texToHtml(tex) {
+        return '<span class="tex">' + render(tex.match(TOKEN) || []) + "</span>";
+    }
+
+    // Lay out every \( ... \) under root. Only the text is replaced, not the elements
+    // around it, so the hover listeners on the tooltips keep working
+    function typeset(root) {
+        var walker = document.createTreeWalker(root || document.body, NodeFilter.SHOW_TEXT);
+        var found = [];
+        while (walker.nextNode()) {
+            if (walker.currentNode.nodeValue.indexOf("\\(") !== -1) {
+                found.push(walker.currentNode);
+            }
+        }
+        found.forEach(function(node) {
+            var text = node.nodeValue;
+            var html = "";
+            var last = 0;
+            text.replace(INLINE_MATH, function(match, tex, offset) {
+                html += escapeHtml(text.slice(last, offset)) + texToHtml(tex);
+                last = offset + match.length;
+                return match;
+            });
+            var span = document.createElement("span");
+            span.innerHTML = html + escapeHtml(text.slice(last));
+            node.parentNode.replaceChild(span, node);
+        });
+    }
+
+    window.texMath = {texToHtml: texToHtml, typeset: typeset};
+})();